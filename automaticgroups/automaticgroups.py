@@ -1,4 +1,3 @@
-import sympy
 import numpy as np
 import subprocess
 import os
@@ -7,6 +6,16 @@ import glob
 import itertools
 import copy
 import random
+import functools
+import re
+import hashlib
+import shutil
+import mmap
+import concurrent.futures
+try:
+    import scipy.optimize
+except ImportError:
+    scipy=None
 
 
 # requires kbmag, available at:   http://homepages.warwick.ac.uk/~mareg/download/kbmag2/
@@ -61,9 +70,9 @@ class groupelement(object):
             raise NameError('group definition file not found')
         if not os.path.isfile(thefilename+'.diff1'):
             if self.location_of_autgroup_binary is None:
-                subprocess.run(['autgroup','-silent',thefilename],check=True,timeout=timeout)
+                subprocess.run(['autgroup','-silent',thefilename],check=True,timeout=timeout,close_fds=False)
             else:
-                subprocess.run([self.location_of_autgroup_binary,'-silent',thefilename],check=True,timeout=timeout)
+                subprocess.run([self.location_of_autgroup_binary,'-silent',thefilename],check=True,timeout=timeout,close_fds=False)
         try:
             self.string=wordreduce(thestring,thefilename,self.location_of_wordreduce_binary)
         except OSError:#sometimes wordreduce fails for unknown reasons and it is sufficient to just try again
@@ -90,8 +99,16 @@ class groupelement(object):
             return groupelement('',self.groupfilename, self.location_of_autgroup_binary, self.location_of_wordreduce_binary)
         elif thepower<0:
             return (self.inverse())**(-thepower)
-        else:
-            return groupelement(self.string*thepower,self.groupfilename, self.location_of_autgroup_binary, self.location_of_wordreduce_binary)
+        else: # square and multiply, so wordreduce only sees products of two reduced words
+            result=None
+            base=self
+            while thepower:
+                if thepower&1:
+                    result=base if result is None else result*base
+                thepower>>=1
+                if thepower:
+                    base=base*base
+            return result
         
     def __mul__(self,other):
         return groupelement(self.string+other.string,self.groupfilename, self.location_of_autgroup_binary, self.location_of_wordreduce_binary)
@@ -103,17 +120,71 @@ class groupelement(object):
 def wordreduce(thestring,thefilename,location_of_wordreduce_binary=None):
     """
     Given thestring returns the shortlex minimal string representing the same group element as determined by automatic strucure for the group defined in thefilename.
+    Results are cached, keyed by thefilename and the free reduction of thestring. Call forgetgroupfile(thefilename) if the structure files are deleted or changed.
     """
+    return _cachedwordreduce(freereducestring(thestring),thefilename,location_of_wordreduce_binary)
+
+@functools.lru_cache(maxsize=200000)
+def _cachedwordreduce(thestring,thefilename,location_of_wordreduce_binary=None):
     if location_of_wordreduce_binary is None:
-        p=subprocess.Popen(['wordreduce',thefilename],stdin=subprocess.PIPE,stderr = subprocess.STDOUT,stdout=subprocess.PIPE)
+        p=subprocess.Popen(['wordreduce',thefilename],stdin=subprocess.PIPE,stderr = subprocess.STDOUT,stdout=subprocess.PIPE,close_fds=False)
     else:
-        p=subprocess.Popen([location_of_wordreduce_binary,thefilename],stdin=subprocess.PIPE,stderr = subprocess.STDOUT,stdout=subprocess.PIPE)
+        p=subprocess.Popen([location_of_wordreduce_binary,thefilename],stdin=subprocess.PIPE,stderr = subprocess.STDOUT,stdout=subprocess.PIPE,close_fds=False)
     output=p.communicate((addstars(thestring)+';').encode('utf-8'))
     return removestars(((output[0]).decode('utf-8').rstrip('\n'))[95:])
 
+def forgetgroupfile(thefilename):
+    """
+    Discard cached reductions for thefilename, eg. because its structure files have been deleted.
+    """
+    _cachedwordreduce.cache_clear() # lru_cache can't forget selectively, but other groups just recompute
+
+def freereducestring(thestring):
+    """
+    Cancel adjacent letters that are inverses of each other, ie 'abBa' -> 'aa'.
+    """
+    reduction=[]
+    for x in thestring:
+        if reduction and reduction[-1]==x.swapcase() and x!=reduction[-1]:
+            reduction.pop()
+        else:
+            reduction.append(x)
+    return ''.join(reduction)
+
 
     
 
+def _certifyinparallel(relators,orderings,timeout,cleanup,**kwargs):
+    """
+    Run certify_hyperbolicity(relators,0,orderedgens,timeout) for each orderedgens in orderings in a pool of worker processes.
+    Return True as soon as one attempt succeeds, otherwise False.
+    Each attempt works in its own subdirectory of tmp_directory so the kbmag files of different attempts do not collide.
+    'max_workers' defaults to the number of cpus.
+    """
+    directory=kwargs.get('tmp_directory','kbmag_tmp_directory')
+    max_workers=kwargs.pop('max_workers',None) or os.cpu_count()
+    Icreatedthisdirectory=False
+    if not os.path.exists(directory):
+        os.mkdir(directory)
+        Icreatedthisdirectory=True
+    ex=concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    futs=[]
+    try:
+        futs=[ex.submit(certify_hyperbolicity,relators,0,orderedgens,timeout,False,cleanup,**dict(kwargs,tmp_directory=directory+'/attempt'+str(i))) for i,orderedgens in enumerate(orderings)]
+        for f in concurrent.futures.as_completed(futs):
+            if f.result():
+                return True
+        return False
+    finally:
+        for f in futs:
+            f.cancel()
+        ex.shutdown(wait=True)
+        if Icreatedthisdirectory and cleanup:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
 def certify_hyperbolicity(relators,tryhard=1,generators=None,timeout=20,verbose=False,cleanup=True,**kwargs):
     """
     Attempt to check if a one relator group is hyperbolic. 
@@ -125,6 +196,7 @@ def certify_hyperbolicity(relators,tryhard=1,generators=None,timeout=20,verbose=
     In principle, if the group is hyperbolic both of these steps will succeed, given enough time, and the function will return True.
     However, if the group is shortlex automatic but not hyperbolic the second step will not terminate.
     'timeout' is time in seconds to allow each of the two steps to run.
+    'max_workers' limits the number of simultaneous attempts made by tryhard=2 and tryhard=3, which run in parallel. Default is the number of cpus.
     tryhard=0 just tries given generators and timeout and quits if unsuccessful. 
     tryhard=1 tries once, and if inconclusive tries again with double timeout time
     tryhard=2 tries once, and if inconclusive tries 10 more times with double timeout time and random permutation of generator order
@@ -162,35 +234,46 @@ def certify_hyperbolicity(relators,tryhard=1,generators=None,timeout=20,verbose=
     writetokbmagfile(directory+'/'+thefilename,generators,relatorsasstrings)
     aut=False 
     hyp=False 
-    if verbose:
-        print("Attempting to find automatic structure with generator order: "+str(generators))
-    try:
-        #subprocess.run(['autgroup','-silent',directory+'/'+thefilename],check=True,timeout=timeout)
-        if 'kbprogargs' in kwargs:
-            kbprogargument=['kbprog']+kwargs['kbprogargs']+[directory+'/'+thefilename]
-        else:
-            kbprogargument=['kbprog','-mt', '20', '-hf', '100', '-cn','0', '-me', '200000', '-silent', '-wd',directory+'/'+thefilename]
-        subprocess.run(kbprogargument,check=True,timeout=timeout)
-        subprocess.run(['gpmakefsa','-silent', directory+'/'+thefilename],check=True,timeout=timeout)
-        subprocess.run(['gpaxioms','-silent',directory+'/'+thefilename],check=True,timeout=timeout)
-        aut=True # all subprocesses completed in time and with returncode=0
-        if verbose:
-            print("Automatic structure found.")
-    except (subprocess.TimeoutExpired,subprocess.CalledProcessError) as e: # if either autgroup timed out or complete with nonzero returncode
+    cachedir=_structurecachedir(kwargs)
+    cachekey=_structurecachekey(generators,relatorsasstrings,'kbprog',kwargs.get('kbprogargs'))
+    if _restorestructure(cachedir,cachekey,directory+'/'+thefilename,'.wa'):
+        aut=True
+        hyp=os.path.isfile(directory+'/'+thefilename+'.geowa')
         if verbose:
-            print("Failed to find automatic structure with error: "+str(e))
-        pass # aut remains False
-    if aut:
+            print("Using cached automatic structure.")
+    elif verbose:
+        print("Attempting to find automatic structure with generator order: "+str(generators))
+    if not aut:
+        try:
+            #subprocess.run(['autgroup','-silent',directory+'/'+thefilename],check=True,timeout=timeout)
+            if 'kbprogargs' in kwargs:
+                kbprogargument=['kbprog']+kwargs['kbprogargs']+[directory+'/'+thefilename]
+            else:
+                kbprogargument=['kbprog','-mt', '20', '-hf', '100', '-cn','0', '-me', '200000', '-silent', '-wd',directory+'/'+thefilename]
+            subprocess.run(kbprogargument,check=True,timeout=timeout,close_fds=False)
+            subprocess.run(['gpmakefsa','-silent', directory+'/'+thefilename],check=True,timeout=timeout,close_fds=False)
+            subprocess.run(['gpaxioms','-silent',directory+'/'+thefilename],check=True,timeout=timeout,close_fds=False)
+            aut=True # all subprocesses completed in time and with returncode=0
+            _storestructure(cachedir,cachekey,directory+'/'+thefilename)
+            if verbose:
+                print("Automatic structure found.")
+        except (subprocess.TimeoutExpired,subprocess.CalledProcessError) as e: # if either autgroup timed out or complete with nonzero returncode
+            if verbose:
+                print("Failed to find automatic structure with error: "+str(e))
+            pass # aut remains False
+    if aut and not hyp:
         try:
             if verbose:
                 print("Checking hyperbolicity.")
-            subprocess.run(['gpgeowa','-silent',directory+'/'+thefilename],check=True,timeout=timeout)
+            subprocess.run(['gpgeowa','-silent',directory+'/'+thefilename],check=True,timeout=timeout,close_fds=False)
             hyp=True
+            _storestructure(cachedir,cachekey,directory+'/'+thefilename)
         except (subprocess.TimeoutExpired,subprocess.CalledProcessError) as e:
             if verbose:
                 print("Failed to find hyperbolic structure with error: "+str(e))
             pass # hyp remains false
     if cleanup:
+        forgetgroupfile(directory+'/'+thefilename)
         files = glob.glob(directory+'/'+thefilename+"*")
         for file in files:
             try:
@@ -221,25 +304,21 @@ def certify_hyperbolicity(relators,tryhard=1,generators=None,timeout=20,verbose=
                 print("Trying again with double wait time.")
             return certify_hyperbolicity(relators,0,generators,2*timeout,verbose,cleanup,**kwargs)
         if tryhard==2:
-            if verbose:
-                for i in range(10):
-                    orderedgens=random.sample(generators,len(generators))
-                    print("Trying kbmag with generator order "+str(orderedgens))
-                    result=certify_hyperbolicity(relators,0,orderedgens,2*timeout,verbose,cleanup,**kwargs)
-                    if result==True:
-                        return True
-                else:
-                    return False
-            else:
-                return any(certify_hyperbolicity(relators,0,random.sample(generators,len(generators)),2*timeout,verbose,cleanup) for i in range(10))
-        if tryhard==3:
-            return any(certify_hyperbolicity(relators,0,permutedgens,2*timeout,verbose,cleanup) for permutedgens in itertools.permutations(generators))
-        return False
+            orderings=[random.sample(generators,len(generators)) for i in range(10)]
+        elif tryhard==3:
+            orderings=[list(permutedgens) for permutedgens in itertools.permutations(generators)]
+        else:
+            return False
+        if verbose:
+            for orderedgens in orderings:
+                print("Trying kbmag with generator order "+str(orderedgens))
+        return _certifyinparallel(relators,orderings,2*timeout,cleanup,**kwargs)
 
 #----------------- for reading and using directly in python the FSA automata produced by kbmag
 def readFSAfromkbmagfile(inputfile):
-    f=open(inputfile,'r')
-    lines=f.readlines()
+    f=open(inputfile,'r',buffering=1<<20)
+    lines=f.read().splitlines(True)
+    f.close()
     for l in range(len(lines)):
         thisline=lines[l]
         if "type :=" in thisline:
@@ -321,6 +400,7 @@ def growthseries(generators,relator,verbose=False,cleanup=True,**kwargs):
     'generators' is list of letters, closed under case change. Ordering defines lexicographic order.
     'relator' is a string whose characters all belong to 'generators'. 
     If 'cleanup=True' then delete all the files created for/by kbmag.
+    If a .wa file at least as new as the group definition file already exists then autgroup is not run again.
     Output is two lists of integers that are coefficients of numerator and denominator of rational function whose Taylor expansion is the growth series. Lists are ordered with higher order coefficients first.
     """
     if 'filename' in kwargs:
@@ -328,18 +408,23 @@ def growthseries(generators,relator,verbose=False,cleanup=True,**kwargs):
     else:
         thefilename="OneRelatorGroup-"+relator
     writetokbmagfile(thefilename,generators,[relator])
+    cachedir=_structurecachedir(kwargs)
+    cachekey=_structurecachekey(generators,[relator],'autgroup')
+    if not _structureisfresh(thefilename,'.wa') and not _restorestructure(cachedir,cachekey,thefilename,'.wa'):
+        if verbose:
+            autrun=subprocess.call(['autgroup','-v',thefilename],close_fds=False)
+        else:
+            autrun=subprocess.call(['autgroup','-silent',thefilename],close_fds=False)
+        assert(autrun==0)
+        _storestructure(cachedir,cachekey,thefilename)
     if verbose:
-        autrun=subprocess.call(['autgroup','-v',thefilename])
-    else:
-        autrun=subprocess.call(['autgroup','-silent',thefilename])
-    assert(autrun==0)
-    if verbose:
-        grrun=subprocess.call(['fsagrowth','-v',thefilename+'.wa'])
+        grrun=subprocess.call(['fsagrowth','-v',thefilename+'.wa'],close_fds=False)
     else:
-        grrun=subprocess.call(['fsagrowth',thefilename+'.wa'])
+        grrun=subprocess.call(['fsagrowth',thefilename+'.wa'],close_fds=False)
     assert(grrun==0)
     rationalfunction=fsagrowthtopolystrings(thefilename+'.wa.growth')
     if cleanup:
+        forgetgroupfile(thefilename)
         files = glob.glob('./'+thefilename+"*")
         for file in files:
             os.remove(file)
@@ -366,103 +451,57 @@ def numericalgrowthrate(generators=None,relator=None,verbose=False,cleanup=True,
     return largestrealeigenvalue(automatatransitionmatrix(generators,relator,verbose,cleanup,**kwargs))
 
 
+# Finds, in one pass over a .wa file, the number of states, the format of the transition table, and the contents of the transition table.
+_waparser=re.compile(rb'states\s*:=\s*rec\(.*?size\s*:=\s*(\d+).*?table\s*:=\s*rec\(.*?format\s*:=\s*"([^"]*)".*?transitions\s*:=\s*\[(.*?)\]\s*\)',re.S)
+
 def automatatransitionmatrix(generators=None,relators=None,verbose=False,cleanup=True,**kwargs):
     """
-    Return (transpose of the) transition matrix of the shortlex automata for group with given generators and relators.
+    Return (transpose of the) transition matrix of the shortlex automata for group with given generators and relators, as a numpy int8 array.
     'generators' is list of letters, closed under case change. Ordering defines lexicographic order.
     'relators' is a list of words in the generators.
     If 'cleanup=True' then delete all the files created for/by kbmag.
-    if 'inputfile' is specified then generators and relators are ignored and the transition table is read directly from an existing file. Otherwise such a .wa file is created by running autgroup from kbmag.
+    if 'inputfile' is specified then generators and relators are ignored and the transition table is read directly from an existing file. Otherwise such a .wa file is created by running autgroup from kbmag, unless one at least as new as the group definition file already exists.
     """
     if 'inputfile' in kwargs:
-        f=open(kwargs['inputfile'],'r')
+        thepath=kwargs['inputfile']
     else:
         if 'filename' in kwargs:
             thefilename=kwargs['filename']
         else:
             thefilename="MyAutomaticGroup"
         writetokbmagfile(thefilename,generators,relators)
-        if verbose:
-            autrun=subprocess.call(['autgroup','-v',thefilename])
-        else:
-            autrun=subprocess.call(['autgroup','-silent',thefilename])
-        assert(autrun==0)
-        f=open(thefilename+".wa","r")
-    lines=f.readlines()
-    currentline=0
-    for thisline in lines:
-        if "states :=" in thisline:
-            break
-        else:
-            currentline=currentline+1
-    for i in range(currentline,len(lines)):
-        if "size :=" in lines[i]:
-            size=int(lines[i].split("size := ",1)[1].rstrip(' ,\n'))
-            break
-    else:
-        raise RunTimeError("Couln't find size of the automata.")
-    currentline=0
-    for thisline in lines:
-        if " table := rec(" in thisline:
-            break
-        else:
-            currentline=currentline+1
-    else:
-        raise RunTimeError("Couldn't find the table record.")
-    for i in range(currentline,len(lines)):
-        thisline=lines[i]
-        if "format := " in thisline:
-            if "dense deterministic" in thisline:
-                theformat='dense'
-            elif "sparse" in thisline:
-                theformat='sparse'
-                NotImplemented
-            else:
-                raise RunTimeError("Couldn't find format string.")
-            break
-    else:
-        raise RunTimeError("Couldn't find format string.")
-    currentline=0
-    for thisline in lines:
-        if "transitions := [" in thisline:
-            break
-        else:
-            currentline=currentline+1
-    else:
-        raise RunTimeError("Couldn't find the transition table.")
-    transitiontable=''
-    openparens=1
-    transtableline=lines[currentline].split('transitions := [',1)[1]
-    while openparens:
-        for x in transtableline:
-            if x=='[':
-                openparens=openparens+1
-            elif x==']':
-                openparens=openparens-1
-                if openparens==0:
-                    break
-            if x==' ' or x=='\n' or x=='\t':
-                pass
-            elif x==',' and transitiontable[-1]==']':
-                transitiontable+=';'
-            else:
-                transitiontable+=x
-        if openparens:
-            currentline=currentline+1
-            transtableline=lines[currentline]
-    trows=transitiontable.split(';')
-    assert(size==len(trows))
-    tmat=[]
-    for trow in trows:
-        targets=[int(c)-1 for c in  (trow.strip(' ,[]\n')).split(',') if c!='' and int(c)>0]
-        tmatrow=[]
-        for j in range(size):
-            if j in targets:
-                tmatrow.append(1)
+        cachedir=_structurecachedir(kwargs)
+        cachekey=_structurecachekey(generators,relators,'autgroup')
+        if not _structureisfresh(thefilename,'.wa') and not _restorestructure(cachedir,cachekey,thefilename,'.wa'):
+            if verbose:
+                autrun=subprocess.call(['autgroup','-v',thefilename],close_fds=False)
             else:
-                tmatrow.append(0)
-        tmat.append(tmatrow)
+                autrun=subprocess.call(['autgroup','-silent',thefilename],close_fds=False)
+            assert(autrun==0)
+            _storestructure(cachedir,cachekey,thefilename)
+        thepath=thefilename+".wa"
+    f=open(thepath,'rb')
+    try:
+        mm=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        try:
+            found=_waparser.search(mm)
+            if found is None:
+                raise RuntimeError("Couldn't find the size, format and transition table of the automata.")
+            size,theformat,transitions=found.groups()
+            del found
+        finally:
+            mm.close()
+    finally:
+        f.close()
+    size=int(size)
+    if theformat!=b'dense deterministic':
+        raise NotImplementedError("Only dense deterministic transition tables are supported, found "+theformat.decode())
+    table=np.fromstring(re.sub(rb'[\[\]\s]',b'',transitions).decode(),dtype=np.int64,sep=',').reshape(size,-1) # row i lists the target state of each generator from state i, 0 for fail state
+    tmat=np.zeros((size,size),dtype=np.int8)
+    rows,cols=np.nonzero(table>0)
+    tmat[rows,table[rows,cols]-1]=1
     if cleanup and not 'inputfile' in kwargs:
+        forgetgroupfile(thefilename)
         files = glob.glob('./'+thefilename+"*")
         for file in files:
             os.remove(file)
@@ -471,17 +510,66 @@ def automatatransitionmatrix(generators=None,relators=None,verbose=False,cleanup
 
 
 def smallpole(num,denom,force=False):
-    droots=np.roots(denom)
-    smallrealdenomroot=droots[(droots.imag==0)&(droots.real>0)].real.min()
+    """
+    Return the smallest positive real root of the polynomial with coefficients denom, highest degree first.
+    For growth series this root is in (0,1], so it is bracketed by a sign change of denom on a grid in (0,1] and refined by bisection.
+    If there is no such sign change, or denom has a critical point before it, so that there could be a root of even multiplicity, fall back to computing all roots.
+    Unless force=True, raise InputError if the root is also a root of num.
+    """
+    coeffs=np.array(denom).astype(float)
+    xs=np.linspace(1e-6,1.0,4096)
+    signchanges=np.nonzero(np.diff(np.sign(np.polyval(coeffs,xs))))[0]
+    smallrealdenomroot=None
+    if len(signchanges):
+        k=signchanges[0]
+        if not len(np.nonzero(np.diff(np.sign(np.polyval(np.polyder(coeffs),xs[:k+2]))))[0]):
+            smallrealdenomroot=_bisect(lambda x:np.polyval(coeffs,x),xs[k],xs[k+1])
+    if smallrealdenomroot is None:
+        droots=np.roots(denom)
+        smallrealdenomroot=droots[np.isclose(droots.imag,0)&(droots.real>0)].real.min() # repeated roots come back with small imaginary parts
     if (not force) and np.isclose(np.polyval(np.array(num).astype(float),smallrealdenomroot),0):
         raise InputError('It appears that the smallest root '+str(smallrealdenomroot)+' of the denominator is also a root of the numerator.')
     return smallrealdenomroot
 
 
+def _bisect(f,a,b):
+    """
+    Return a root of f in [a,b], where f(a) and f(b) do not have the same sign.
+    """
+    if scipy is not None:
+        return scipy.optimize.brentq(f,a,b,xtol=1e-14)
+    fa=f(a)
+    if fa==0:
+        return a
+    if f(b)==0:
+        return b
+    for i in range(100):
+        m=(a+b)/2
+        fm=f(m)
+        if fm==0 or b-a<1e-14:
+            return m
+        if (fm>0)==(fa>0):
+            a,fa=m,fm
+        else:
+            b=m
+    return (a+b)/2
+
+
 def largestrealeigenvalue(M):
+    """
+    Return the largest real eigenvalue of M.
+    The whole spectrum is computed densely: the transition matrices of finite and polynomial growth groups are nilpotent or defective, and iterative eigensolvers report spurious eigenvalues for them.
+
+    >>> largestrealeigenvalue(np.triu(np.ones((50,50)),1)) # nilpotent
+    0.0
+    >>> largestrealeigenvalue(np.eye(40)+np.diag(np.ones(39),1)) # Jordan block for eigenvalue 1
+    1.0
+    >>> round(largestrealeigenvalue(np.array([[1,1],[1,0]])),10)
+    1.6180339887
+    """
     eigvals=np.linalg.eigvals(M)
     realeigvals=[x.real for x in eigvals if np.isreal(x)]
-    return max(realeigvals)
+    return float(max(realeigvals))
 
 
 
@@ -491,6 +579,43 @@ def largestrealeigenvalue(M):
 
 
 #------------------- Auxiliary functions for interacting with kbmag
+
+# The automatic structure files that kbmag computes for a group can be kept in a structure cache directory, so that running the same group through certify_hyperbolicity, growthseries and automatatransitionmatrix, or running it again, does not redo the expensive automaton construction.
+# The cache is used if the keyword argument 'structurecache' or the environment variable KBMAG_CACHE names a directory. Entries are keyed by generator order, relators, and how the structure was computed.
+
+def _structurecachedir(kwargs):
+    if 'structurecache' in kwargs:
+        cachedir=kwargs['structurecache']
+    else:
+        cachedir=os.environ.get('KBMAG_CACHE')
+    if not cachedir:
+        return None
+    cachedir=os.path.expanduser(cachedir)
+    os.makedirs(cachedir,exist_ok=True)
+    return cachedir
+
+def _structurecachekey(generators,relators,*howcomputed):
+    return hashlib.blake2b('|'.join([','.join(generators),','.join(relators)]+[repr(x) for x in howcomputed]).encode('utf-8')).hexdigest()[:16]
+
+def _restorestructure(cachedir,cachekey,thefilename,required):
+    """
+    If the cache has an entry for cachekey that contains a file with suffix 'required', copy all of its files to thefilename+suffix and return True.
+    """
+    if cachedir is None or not os.path.isfile(os.path.join(cachedir,cachekey,'structure'+required)):
+        return False
+    for file in os.listdir(os.path.join(cachedir,cachekey)):
+        shutil.copyfile(os.path.join(cachedir,cachekey,file),thefilename+file[len('structure'):])
+    return True
+
+def _storestructure(cachedir,cachekey,thefilename):
+    """
+    Copy the files kbmag has produced for thefilename into the cache entry for cachekey.
+    """
+    if cachedir is None:
+        return
+    os.makedirs(os.path.join(cachedir,cachekey),exist_ok=True)
+    for file in glob.glob(glob.escape(thefilename)+'.*'):
+        shutil.copyfile(file,os.path.join(cachedir,cachekey,'structure'+file[len(thefilename):]))
     
 def writetokbmagfile(filename,generators,relators,**kwargs):
     """
@@ -498,70 +623,92 @@ def writetokbmagfile(filename,generators,relators,**kwargs):
     'generators' should be a list of generators consisting of lowercase letters and their inverses the corresponding uppercase letters. The order in which they are given is used by kbmag to define lexicographic ordering on words. 
     'relators' should be list of strings conisisitng of upper and lower case letters corresponding to generators and their inverses.
     """
-    f=open(filename,"w")
     if 'description' in kwargs:
-        f.write('# '+kwargs['description']+'\n')
+        content='# '+kwargs['description']+'\n'
     else:
-        f.write('# some group\n')
-    f.write('_RWS := rec(\n')
-    f.write('  isRWS := true,\n')
-    f.write('  ordering := "shortlex",\n')
-    f.write('  generatorOrder := ['+','.join(generators)+'],\n')
-    f.write('  inverses := ['+','.join([x.swapcase() for x in generators])+'],\n')
-    f.write('  equations := ['+','.join(['['+str(addstars(relatorstring))+',IdWord]' for relatorstring in relators])+']\n')
-    f.write(');')
+        content='# some group\n'
+    content+='_RWS := rec(\n'
+    content+='  isRWS := true,\n'
+    content+='  ordering := "shortlex",\n'
+    content+='  generatorOrder := ['+','.join(generators)+'],\n'
+    content+='  inverses := ['+','.join([x.swapcase() for x in generators])+'],\n'
+    content+='  equations := ['+','.join(['['+str(addstars(relatorstring))+',IdWord]' for relatorstring in relators])+']\n'
+    content+=');'
+    if os.path.isfile(filename):
+        f=open(filename,"r")
+        oldcontent=f.read()
+        f.close()
+        if oldcontent==content: # leave the file, and so its modification time, alone so that structure files computed from it stay fresh
+            return
+        forgetgroupfile(filename)
+    f=open(filename,"w")
+    f.write(content)
+    f.close()
+
+def _structureisfresh(thefilename,suffix):
+    """
+    Return True if kbmag output thefilename+suffix exists and is at least as new as the group definition file thefilename.
+    """
+    return os.path.isfile(thefilename+suffix) and os.path.getmtime(thefilename+suffix)>=os.path.getmtime(thefilename)
 
 def addstars(s):
     if s=='' or s==[]:
         return 'IdWord'
     else:
-        t=''
-        for i in range(len(s)-1):
-            t=t+s[i]+'*'
-        t=t+s[-1]
-        return t
+        return '*'.join(s)
+
+_letterpower=re.compile(r'([A-Za-z])\^(\d+)')
 
 def removestars(s):
     if s=='IdWord':
         return ''
     else:
-        rstring=s
-        while '^' in rstring:
-            i=rstring.index('^')
-            theletter=rstring[i-1]
-            if '*' not in rstring[i+1:]:
-                thepower=int(rstring[i+1:])
-                j=len(rstring)
-            else:
-                j=i+1+rstring[i+1:].index('*')
-                thepower=int(rstring[i+1:j])
-            rstring=rstring[:i-1]+theletter*thepower+rstring[j+1:]
-        string=''
-        for x in [x for x in rstring if x!='*']:
-            string=string+x
-        return string
+        return _letterpower.sub(lambda m: m.group(1)*int(m.group(2)),s).replace('*','')
 
 
+_alphabet=['Z','Y','X','W','V','U','T','S','R','Q','P','O','N','M','L','K','J','I','H','G','F','E','D','C','B','A','','a','b','c','d','e','f','g','h','i','j','k','l','m','n','o','p','q','r','s','t','u','v','w','x','y','z']
+_letternumbers={_alphabet[i]:i-26 for i in range(len(_alphabet)) if _alphabet[i]}
+
 def intlisttoletterstring(intlist):
-    alphabet=['Z','Y','X','W','V','U','T','S','R','Q','P','O','N','M','L','K','J','I','H','G','F','E','D','C','B','A','','a','b','c','d','e','f','g','h','i','j','k','l','m','n','o','p','q','r','s','t','u','v','w','x','y','z']
-    return ''.join([alphabet[26+x]  for x in intlist])
+    return ''.join([_alphabet[26+x]  for x in intlist])
 
 def letterstringtointlist(thestring):
-    alphabet=['Z','Y','X','W','V','U','T','S','R','Q','P','O','N','M','L','K','J','I','H','G','F','E','D','C','B','A','','a','b','c','d','e','f','g','h','i','j','k','l','m','n','o','p','q','r','s','t','u','v','w','x','y','z']
-    return [alphabet.index(c)-26 for c in thestring]
+    try:
+        return [_letternumbers[c] for c in thestring]
+    except KeyError as e:
+        raise ValueError(str(e)+" is not a letter")
+
+# A term of a univariate polynomial such as 3*x^2, -x, or 7, with whitespace removed.
+_polyterm=re.compile(r'([+-]?)(\d*)\*?([A-Za-z_]\w*)?(?:\^(\d+))?')
+
+def polystringtocoeffs(polystring):
+    """
+    Return the list of integer coefficients, higher order coefficients first, of a univariate polynomial with integer coefficients written as a string such as '1-3*x+x^2'.
+    """
+    polystring=re.sub(r'\s','',polystring).replace('**','^')
+    coeffs={}
+    position=0
+    while position<len(polystring):
+        term=_polyterm.match(polystring,position)
+        if term is None or term.end()==position or not (term.group(2) or term.group(3)):
+            raise ValueError("Couldn't parse polynomial "+polystring)
+        coeff=int(term.group(2)) if term.group(2) else 1
+        if term.group(1)=='-':
+            coeff=-coeff
+        degree=(int(term.group(4)) if term.group(4) else 1) if term.group(3) else 0
+        coeffs[degree]=coeffs.get(degree,0)+coeff
+        position=term.end()
+    if not coeffs:
+        raise ValueError("Couldn't parse polynomial "+polystring)
+    return [coeffs.get(d,0) for d in range(max(coeffs),-1,-1)]
 
 def fsagrowthtopolystrings(filename):
-    f=open(filename,"r")
-    lines=f.readlines()
+    f=open(filename,"r",buffering=1<<20)
+    lines=f.read().splitlines(True)
+    f.close()
     assert('as previous' in lines[-1] and 'as previous' in lines[-2])
-    liness=lines[3:-2]
-    line=''
-    for l in liness:
-        line=line+(l.rstrip('\n'))
-    numbegin=line.index('(')
-    numend=line.index(')')
-    denombegin=1+numend+(line[1+numend:]).index('(')
-    denomend=1+numend+(line[1+numend:]).index(')')
-    return sympy.poly(line[1+numbegin:numend]).all_coeffs(),sympy.poly(line[1+denombegin:denomend]).all_coeffs()
+    line=''.join(l.rstrip('\n') for l in lines[3:-2])
+    num,denom=re.findall(r'\(([^()]*)\)',line)[:2]
+    return polystringtocoeffs(num),polystringtocoeffs(denom)
 
 
@@ -1,8 +1,10 @@
 from grouptheory.group import *
+from grouptheory.group import _squareandmultiply
 import grouptheory.freegroups.freegroup as fg
 import copy
 import random
 import itertools
+import functools
 
 # defines Whitehead and Nielsen automorphisms of free group
 
@@ -36,6 +38,18 @@ class WhiteheadAuto(Automorphism):
             self.x=1
             self.Z=set([1])
         assert((self.x in self.Z) and not(-self.x in self.Z))          
+        self.action=dict() # image of each generator and inverse generator, as a tuple of letters
+        for y in list(range(-F.rank,0))+list(range(1,1+F.rank)):
+            if abs(y)==abs(self.x):
+                self.action[y]=(y,)
+            elif y in self.Z and -y not in self.Z:
+                self.action[y]=(self.x,y)
+            elif y not in self.Z and -y in self.Z:
+                self.action[y]=(y,-self.x)
+            elif y in self.Z and -y in self.Z:
+                self.action[y]=(self.x,y,-self.x)
+            else:
+                self.action[y]=(y,)
 
     def variant_generators(self):
         return [i for i in self.Z if i!=self.x]
@@ -46,22 +60,7 @@ class WhiteheadAuto(Automorphism):
         return 'Push '+str(self.Z)+' through {'+str(self.x)+'}'
         
     def __call__(self,w): #evaluate the automorphism on the word w and return a word in codomain
-        theletters=copy.copy(w.letters)
-        imagewordletters=[]
-        while theletters:
-            nextletter=theletters.pop(0)
-            if abs(nextletter)==abs(self.x):
-                nextwordletters=[nextletter]
-            elif nextletter in self.Z and -nextletter not in self.Z:
-                nextwordletters=[self.x,nextletter]
-            elif nextletter not in self.Z and -nextletter in self.Z:
-                nextwordletters=[nextletter,-self.x]
-            elif nextletter in self.Z and -nextletter in self.Z:
-                nextwordletters=[self.x,nextletter,-self.x]
-            else:
-                nextwordletters=[nextletter]
-            imagewordletters+=nextwordletters
-        return self.codomain.word(imagewordletters)
+        return self.codomain.word(list(itertools.chain.from_iterable(self.action[nextletter] for nextletter in w.letters)))
 
     def inverse(self):
         if self.x and self.Z:
@@ -97,14 +96,9 @@ class WhiteheadAuto(Automorphism):
         elif n==-1:
             return self.inverse()
         elif n>1:
-            for i in range(n):
-                result=result * self
-            return result
+            return _squareandmultiply(result,self,n)
         else:
-            inverse=self.inverse()
-            for i in range(-n):
-                result=result * inverse
-            return result
+            return _squareandmultiply(result,self.inverse(),-n)
             
 class WhiteheadAutomorphismOfTheFirstKind(Automorphism):
     """
@@ -124,9 +118,13 @@ class WhiteheadAutomorphismOfTheFirstKind(Automorphism):
         D=dict()
         self.powers=inversionlist
         self.permutation=permutationofgenerators
+        self.signedpermutation=[self.powers[i]*self.permutation[i] for i in range(F.rank)] # image of i-th generator is the signedpermutation[i-1]-th generator or inverse generator
         for i in range(1,1+F.rank):
-            D[i]=F.word([self.powers[i-1]*self.permutation[i-1]])
-            Automorphism.__init__(self,F,D)
+            D[i]=F.gen(self.signedpermutation[i-1])
+        Automorphism.__init__(self,F,D)
+
+    def __call__(self,w): #evaluate the automorphism on the word w and return a word in codomain
+        return self.codomain.word([self.signedpermutation[l-1] if l>0 else -self.signedpermutation[-l-1] for l in w.letters])
 
     def inverse(self):
         return WhiteheadAutomorphismOfTheFirstKind(self.domain,[1+self.permutation.index(i) for i in range(1,1+self.domain.rank)],[self.powers[self.permutation.index(i)] for i in range(1,1+self.domain.rank)])
@@ -142,15 +140,10 @@ class WhiteheadAutomorphismOfTheFirstKind(Automorphism):
         if n==0:
             return result
         elif n>0:
-            for i in range(n):
-                result=result*self
-            return result
+            return _squareandmultiply(result,self,n)
         else:
-            inverse=self.inverse()
-            for i in range(-n):
-                result=result*inverse
-            return result
-    
+            return _squareandmultiply(result,self.inverse(),-n)
+
 def random_whitehead_automorphism(F):
     """
     A random Whitehead automorphism (of the second kind) of a free group F.
@@ -182,17 +175,18 @@ def random_whitehead_automorphism_of_the_first_kind(F):
 def random_automorphism_pair(F,length):
     """
     Generate an automorphism and its inverse by taking a product of 'length'-many random Whitehead automorphisms.
+    The automorphisms are returned as LazyAutomorphisms, which apply the factors in turn when evaluated instead of composing them up front.
     """
-    randomaut=Automorphism(F)
-    inverse=Automorphism(F)
+    factors=[]
+    inversefactors=[]
     for i in range(length):
         if random.random()<.5:
             w=random_whitehead_automorphism(F)
         else:
             w=random_whitehead_automorphism_of_the_first_kind(F)
-        randomaut=w*randomaut
-        inverse=inverse*(w.inverse())
-    return randomaut, inverse
+        factors.append(w)
+        inversefactors.append(w.inverse())
+    return LazyAutomorphism(F,factors[::-1]), LazyAutomorphism(F,inversefactors)
 
 def random_automorphism(F, length):
     return random_automorphism_pair(F,length)[0]
@@ -218,12 +212,12 @@ def is_inner_auto_by(alpha):
     """
     F=alpha.domain
     if F.rank==1:
-        if alpha(F.word([1]))==F.word([1]):
+        if alpha(F.gen(1))==F.gen(1):
             return F.word([])
         else:
             return None
     else:
-        g=[F.word([i]) for i in range(1,1+F.rank)] # basis elements of F
+        g=[F.gen(i) for i in range(1,1+F.rank)] # basis elements of F
         h=[alpha(gen) for gen in g] # alpha images of basis elements
         conjugators=[F.get_conjugator(g[i],h[i]) for i in range(F.rank)]
         if any(conj is None for conj in conjugators): # some generator is not sent to a conjugate
@@ -238,49 +232,28 @@ def is_inner_auto_by(alpha):
             # chceck if x is of this form and if so deduce a[0] and a[1]
             # this determines a unique candidate w
             a=[None for i in range(F.rank)]
-            x=(conjugators[0])*(conjugators[1])**(-1)
+            conjugatorinverses=[conj**(-1) for conj in conjugators]
+            x=(conjugators[0])*conjugatorinverses[1]
             if len(x)==0:
                 a[0]=0
                 a[1]=0
             else:
-                if x.letters[0]==-1 and x.letters[-1]==2:
-                    change=x.letters.index(2)
-                    if x.letters==[-1 for i in range(change)]+[2 for i in range(len(x.letters)-change)]:
-                        a[0]=(change-1)
-                        a[1]=(len(x.letters)-change)
-                    else:
-                        return None
-                elif x.letters[0]==-1 and x.letters[-1]==-2:
-                    change=x.letters.index(-2)
-                    if x.letters==[-1 for i in range(change)]+[-2 for i in range(len(x.letters)-change)]:
-                        a[0]=(change-1)
-                        a[1]=-(len(x.letters)-change)
-                    else:
-                        return None
-                elif x.letters[0]==1 and x.letters[-1]==2:
-                    change=x.letters.index(2)
-                    if x.letters==[1 for i in range(change)]+[2 for i in range(len(x.letters)-change)]:
-                        a[0]=-(change-1)
-                        a[1]=(len(x.letters)-change)
-                    else:
-                        return None
-                elif x.letters[0]==1 and x.letters[-1]==-2:
-                    change=x.letters.index(-2)
-                    if x.letters==[1 for i in range(change)]+[-2 for i in range(len(x.letters)-change)]:
-                        a[0]=-(change-1)
-                        a[1]=-(len(x.letters)-change)
-                    else:
-                        return None
-                elif abs(x.letters[0])==2:
-                    if x.letters==[x.letters[0] for i in range(len(x.letters))]:
-                        a[1]=sign(x.letters[0])*len(x.letters)
-                        a[0]=0
+                runs=_tworuns(x.letters)
+                if runs is None:
+                    return None
+                first,change,last=runs
+                if change<len(x.letters): # x=g[0]**(-a[0])*g[1]**a[1] with both powers nonzero
+                    if abs(first)==1 and abs(last)==2:
+                        a[0]=-first*(change-1)
+                        a[1]=(last//2)*(len(x.letters)-change)
                     else:
                         return None
-                elif abs(x.letters[0])==1:
-                    if x.letters==[x.letters[0] for i in range(len(x.letters))]:
-                        a[1]=0
-                        a[0]=-sign(x.letters[0])*len(x.letters)
+                elif abs(first)==2:
+                    a[1]=sign(first)*len(x.letters)
+                    a[0]=0
+                elif abs(first)==1:
+                    a[1]=0
+                    a[0]=-sign(first)*len(x.letters)
                 else:
                     return None
             w=(g[0])**(a[0])*conjugators[0]
@@ -289,12 +262,13 @@ def is_inner_auto_by(alpha):
             for i in range(2,F.rank):
                 # if inner then w=g[i]**(a[i])*conjugators[i] for some a[i]
                 # so a[i] is power such that w*conjugators[i]**(-1)=g[i]**a[i]
-                x=w*(conjugators[i])**(-1)
+                x=w*conjugatorinverses[i]
                 if len(x)==0:
                     a[i]=0
                 else:
                     if abs(x.letters[0])==i+1:
-                        if x.letters==[x.letters[0]]*len(x.letters):
+                        runs=_tworuns(x.letters)
+                        if runs is not None and runs[1]==len(x.letters):
                             a[i]=sign(x.letters[0])*len(x.letters)
                         else:
                             return None
@@ -306,6 +280,23 @@ def is_inner_auto_by(alpha):
             # so for all i we have h[i]=conjugators[i]**(-1)*g[i]*conjugators[i]=w**(-1)*g[i]*w
             return w
                 
+def _tworuns(letters):
+    """
+    If letters is a run of copies of one letter followed by a possibly empty run of copies of another letter, return (first letter, index where the second run starts, last letter).
+    Otherwise return None. letters should be nonempty.
+    """
+    first=letters[0]
+    change=len(letters)
+    for i in range(1,len(letters)):
+        if letters[i]!=first:
+            change=i
+            break
+    last=letters[-1]
+    for i in range(change,len(letters)):
+        if letters[i]!=last:
+            return None
+    return first,change,last
+
 def is_inner_auto(alpha):
     w=is_inner_auto_by(alpha)
     if w is None:
@@ -317,22 +308,38 @@ def powerset(iterable,allow_empty=True,cap=None):
     """
     generator that yields subsets of iterable of size at most cap.
     """
+    elements=list(iterable)
     if cap is None:
-        thecap=len(iterable)
+        thecap=len(elements)
     else:
         thecap=cap
     if allow_empty:
-        return itertools.chain.from_iterable(itertools.combinations(list(iterable), r) for r in range(thecap+1))
+        return itertools.chain.from_iterable(itertools.combinations(elements, r) for r in range(thecap+1))
     else:
-        return itertools.chain.from_iterable(itertools.combinations(list(iterable), r) for r in range(1,thecap+1))
+        return itertools.chain.from_iterable(itertools.combinations(elements, r) for r in range(1,thecap+1))
+
+def powerset_masks(n,cap=None,allow_empty=True):
+    """
+    generator that yields the subsets of range(n) of size at most cap as bitmasks, with bit i set if i is in the subset.
+    Subsets come in the same order as from powerset(range(n)).
+
+    >>> list(powerset_masks(3,cap=2,allow_empty=False))
+    [1, 2, 4, 3, 5, 6]
+    """
+    if cap is None:
+        cap=n
+    bits=[1<<i for i in range(n)]
+    for r in range(0 if allow_empty else 1,cap+1):
+        for subset in itertools.combinations(bits,r):
+            yield sum(subset)
 
 def NielsenGenerators(F):
     """
     Generator that yields Nielsen generators of Aut(F)
     """
-    yield Automorphism(F,{1:F.word([2]),2:F.word([1])}) # swap first two basis elements
-    yield Automorphism(F,dict({i:F.word([i+1]) for i in range(1,F.rank)},**{F.rank:F.word([1])})) # cycically permute basis
-    yield Automorphism(F,{1:F.word([-1])}) # invert first basis element
+    yield Automorphism(F,{1:F.gen(2),2:F.gen(1)}) # swap first two basis elements
+    yield Automorphism(F,dict({i:F.gen(i+1) for i in range(1,F.rank)},**{F.rank:F.gen(1)})) # cycically permute basis
+    yield Automorphism(F,{1:F.gen(-1)}) # invert first basis element
     yield Automorphism(F,{1:F.word([1,2])}) # transvection
     yield Automorphism(F,{1:F.word([1,-2])}) # inverse transvection
 
@@ -346,11 +353,9 @@ def WhiteheadAutomorphisms(F,allow_inner=False,both_kinds=False):
     if both_kinds:
         inversionlist=[1 for i in range(F.rank)] # no generator inversions, so permutation must be nontrivial
         permutationsofgenerators=itertools.permutations([x for x in range(1,1+F.rank)])
+        next(permutationsofgenerators) # permutations yields the trivial permutation first
         for permutationofgenerators in permutationsofgenerators:
-            if list(permutationofgenerators)==letters[:F.rank]: # trivial permutation
-                pass
-            else:
-                yield WhiteheadAutomorphismOfTheFirstKind(F,permutationofgenerators,inversionlist)
+            yield WhiteheadAutomorphismOfTheFirstKind(F,permutationofgenerators,inversionlist)
         invertedgenlists=powerset([x for x in range(F.rank)],allow_empty=False) # some generator is inverted, so permutation may be trivial
         for invertedgenlist in invertedgenlists:
             inversionlist=[-1 if i in invertedgenlist else 1 for i in range(F.rank)]
@@ -359,12 +364,26 @@ def WhiteheadAutomorphisms(F,allow_inner=False,both_kinds=False):
                 yield WhiteheadAutomorphismOfTheFirstKind(F,permutationofgenerators,inversionlist)
     # now Whitehead automorphisms of the second kind
     for x in letters:
+        candidates=[y for y in letters if abs(y)!=abs(x)]
         if allow_inner:
-            Zs=powerset([y for y in letters if abs(y)!=abs(x)],allow_empty=False) # this is a generator for subsets Z' such that Z=Z'\cup {x} is used to define Whitehead automorphism
+            masks=_subsetmasks(len(candidates),len(candidates)) # bitmasks of nonempty subsets Z' such that Z=Z'\cup {x} is used to define Whitehead automorphism
         else:
-            Zs=powerset([y for y in letters if abs(y)!=abs(x)],allow_empty=False,cap=len(letters)-3)
-        for Z in Zs:
-            yield WhiteheadAuto(F,x,[x]+[y for y in Z])
+            masks=_subsetmasks(len(candidates),len(letters)-3)
+        for mask in masks: # masks are nonempty, so Z={x} giving the identity never occurs
+            yield whitehead_auto_from_mask(F,x,candidates,mask)
+
+def whitehead_auto_from_mask(F,x,candidates,mask):
+    """
+    The Whitehead automorphism WhiteheadAuto(F,x,Z) where Z consists of x and those candidates[i] such that bit i of the integer mask is set.
+    """
+    return WhiteheadAuto(F,x,[x]+[candidates[i] for i in range(len(candidates)) if mask>>i&1])
+
+@functools.lru_cache(maxsize=None)
+def _subsetmasks(n,cap):
+    """
+    Tuple of bitmasks of the nonempty subsets of range(n) of size at most cap, in the same order that powerset(range(n),allow_empty=False,cap=cap) produces the subsets.
+    """
+    return tuple(powerset_masks(n,cap=cap,allow_empty=False))
 
 
 
@@ -1,23 +1,44 @@
 import itertools
+import array
+import numpy as np
 
 def generate_words(rank,maxlen,startlength=1,reversed=True):
     """
-    Generator of unique, non-trivial words in a free group of given rank,  up to length maxlen. Words returned as list of non-zero integers, with 1 corresponding to first generator, -1 its inverse, etc.
+    Generator of unique, non-trivial words in a free group of given rank,  up to length maxlen. Words returned as array.array of non-zero integers, with 1 corresponding to first generator, -1 its inverse, etc. The array has typecode 'b' if rank<128, else 'i'.
     If reversed=True then the words increment on the right.
     """
     letters=[-x for x in range(rank,0,-1)]+[x for x in range(1,1+rank)]
-    counters=dict()
-    for i in range(startlength):
-        counters[i]=0
+    if 2*rank<256:
+        counters=bytearray(startlength)
+    else:
+        counters=[0]*startlength
+    if rank<128: # translate counter bytes directly into signed byte letters
+        table=bytes(x&0xff for x in letters)+bytes(256-len(letters))
+        makeword=lambda c: array.array('b',c.translate(table))
+    else:
+        makeword=lambda c: array.array('i',[letters[i] for i in c])
     maxindex=startlength-1
-    theletters=[letters[counters[i]] for i in range(maxindex+1)]
     while maxindex<maxlen:
         if reversed:
-            yield theletters[::-1]
+            yield makeword(counters[::-1])
         else:
-            yield theletters
+            yield makeword(counters[:])
         maxindex=maxindex+nextword(rank,counters,letters,maxindex)
-        theletters=[letters[counters[i]] for i in range(maxindex+1)]
+
+def generate_words_batched(rank,maxlen,startlength=1,batch=1<<16):
+    """
+    Generator of the same words as generate_words, but returned in batches as 2 dimensional numpy arrays whose rows are words of a common length. Each batch has at most batch rows.
+    Words of each length are built at once from the words one letter shorter, by appending every letter and discarding rows whose last two letters cancel.
+    """
+    letters=np.array([-x for x in range(rank,0,-1)]+[x for x in range(1,1+rank)],dtype=np.int8 if rank<128 else np.int32)
+    words=letters.reshape(-1,1)
+    for length in range(1,maxlen+1):
+        if length>1:
+            words=np.hstack([np.repeat(words,len(letters),axis=0),np.tile(letters,len(words)).reshape(-1,1)])
+            words=words[words[:,-2]+words[:,-1]!=0]
+        if length>=startlength:
+            for i in range(0,len(words),batch):
+                yield words[i:i+batch]
 
 def generate_ordered(rank,maxlen,startlength=1):
     """
@@ -27,58 +48,57 @@ def generate_ordered(rank,maxlen,startlength=1):
     for w in gen:
         if w[0]!=-rank:
             continue
-        if all([x==-rank for x in w]):
-            yield w
-        else:
-            for firstnon1 in range(len(w)):
-                if w[firstnon1]!=-rank:
+        seenrankminusone=False # becomes True at the first letter that is not -rank, which must be -(rank-1)
+        for x in w:
+            if not seenrankminusone:
+                if x==-rank:
+                    continue
+                if x!=-(rank-1):
                     break
-            if w[firstnon1]!=-(rank-1):
-                continue
-            else:
-                if all([abs(x)>=rank-1 for x in w]):
+                seenrankminusone=True
+            elif abs(x)<rank-1: # first letter other than +-rank, +-(rank-1) decides
+                if x==-(rank-2):
                     yield w
-                else:
-                    for firstnon12 in range(len(w)):
-                        if abs(w[firstnon12])<rank-1:
-                            break
-                    if w[firstnon12]==-(rank-2):
-                        yield w
-                    else:
-                        continue
-                    
+                break
+        else:
+            yield w
 
         
 def advance_counter(thecounter,index,resetval):
     """
-    Advance a big-endian counter. thecounter is a list of non-negative integers. index is index to be incremented by 1. resetval is number at which the place value should rollover and the next index should be incremented.
+    Advance a big-endian counter. thecounter is a bytearray or list of non-negative integers. index is index to be incremented by 1. resetval is number at which the place value should rollover and the next index should be incremented.
     Return value is largest index whose value changed.
     """
-    thecounter[index]=(thecounter[index]+1)%resetval
-    if thecounter[index]==0:
-        if index+1 not in thecounter:
-            thecounter[index+1]=0
-            return index+1
-        else:
-            return advance_counter(thecounter,index+1,resetval)
-    else:
-        return index
+    while True:
+        thecounter[index]=(thecounter[index]+1)%resetval
+        if thecounter[index]:
+            return index
+        index+=1
+        if index==len(thecounter):
+            thecounter.append(0)
+            return index
     
 def nextword(rank,counters,letters,maxindex,index=0):
-    checkindex=advance_counter(counters,index,2*rank) # advance the counters at index and set checkindex to largest index that changed.
-    if checkindex==maxindex+1: # length increased, no free reductions
-        return 1
-    elif checkindex<maxindex and letters[counters[checkindex]]+letters[counters[checkindex+1]]==0: # there is a forward free reduction, recurse
-        return nextword(rank,counters,letters,maxindex,index=checkindex)
-    elif checkindex>0 and letters[counters[checkindex]]+letters[counters[checkindex-1]]==0: # there is a backward free reduction, recurse
-        return nextword(rank,counters,letters,maxindex,index=checkindex-1)
-    else: # no free reduction or length increase
-        return 0
+    while True:
+        checkindex=advance_counter(counters,index,2*rank) # advance the counters at index and set checkindex to largest index that changed.
+        if checkindex==maxindex+1: # length increased, no free reductions
+            return 1
+        elif checkindex<maxindex and letters[counters[checkindex]]+letters[counters[checkindex+1]]==0: # there is a forward free reduction, advance again from there
+            index=checkindex
+        elif checkindex>0 and letters[counters[checkindex]]+letters[counters[checkindex-1]]==0: # there is a backward free reduction, advance again from there
+            index=checkindex-1
+        else: # no free reduction or length increase
+            return 0
         
 def evaluate_word(word,elements,gpproduct=None,gpinverse=None):
     """
     Evaluate a word w in {1,-1,..,i,-i} by replacing 1 with group element elements[i], -1 with elements[1]^{-1}, etc.
+    If the elements are automaticgroups groupelements the product is formed as one string and reduced once, rather than one multiplication at a time.
     """
+    if gpproduct is None and elements[0].__class__.__name__=='groupelement' and all(x.groupfilename==elements[0].groupfilename for x in elements):
+        g=elements[0]
+        parts=[elements[x-1].string if x>0 else elements[-x-1].string.swapcase()[::-1] for x in word]
+        return g.__class__(''.join(parts),g.groupfilename,g.location_of_autgroup_binary,g.location_of_wordreduce_binary)
     if gpproduct:
         z=gpproduct(elements[0],gpinverse(elements[0]))
     else:
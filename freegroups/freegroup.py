@@ -529,11 +529,9 @@ class FGSubgroupOfFree(FGSubgroup, FGFreeGroup):
                 break
         except KeyError: # treelabels not set, set them
             mark_max_tree(self.graph)
-        letters=self.supergroup.word(wordorletters).letters
         graphletters=[]
         currentvert=startingvert
-        while letters:
-            nextletter=letters.pop(0)
+        for nextletter in self.supergroup.word(wordorletters).letters:
             for edge in self.graph.out_edges(currentvert,keys=True,data=True):
                 if edge[3]['superlabel']==nextletter:
                     if edge[3]['treelabel']: # if this is not an edge of the marked maximal subtree
@@ -556,10 +554,8 @@ class FGSubgroupOfFree(FGSubgroup, FGFreeGroup):
         """
         Take a list of integers from {-rank..-1}u{1,..rank} interpreted as a loop in the graph and return the corresponding word with repsect to the given basis.
         """
-        theletters=[x for x in graphletters]
         theword=self.word([])
-        while theletters: # translate graphletters to groupletters
-            nextletter=theletters.pop(0)
+        for nextletter in graphletters: # translate graphletters to groupletters
             if nextletter>0:
                 theword=theword*self.inversemarking[nextletter-1]
             elif nextletter<0:
@@ -1240,10 +1236,8 @@ def follow_path(theSG,superletters,origin, withgraphletters=False):
     Start at vertex origin. Follow edges labeled by superletters. Return terminal vertex or None given superletters do not form an edgepath.
     """
     currentvertex=origin
-    theletters=[i for i in superletters]
     thegraphletters=[]
-    while theletters:
-        nextletter=theletters.pop(0)
+    for nextletter in superletters:
         for e in theSG.out_edges(currentvertex, keys=True, data=True):
             if e[3]['superlabel']==nextletter:
                 currentvertex=e[1]
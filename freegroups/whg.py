@@ -8,6 +8,7 @@ import grouptheory.freegroups.AutF as aut
 import grouptheory.freegroups.graphofgroups as gog
 import grouptheory.freegroups.whiteheadgraph as wg
 from grouptheory.freegroups.whiteheadgraph.test.knownexamples import *
+from grouptheory.freegroups.whiteheadgraph.test.knownexamples import Com,BS12,BS13,TK,K4,K4HNN,BS12A,K6,AS,NonTree,K33,Baumslag,BS23
 import grouptheory.freegroups.whiteheadgraph.test.checkcutpair as checkcutpair
 import grouptheory.freegroups.whiteheadgraph.test.rjsj as rjsj
 
@@ -3,19 +3,77 @@ import networkx as nx
 import grouptheory.freegroups.whiteheadgraph.orderedmultigraph as omg
 import grouptheory.freegroups.whiteheadgraph.wgraph as wg
 import math
+import functools
 import random
 import grouptheory.freegroups.whiteheadgraph.draw.hyperbolicdisc as hdisc
 import grouptheory.freegroups.whiteheadgraph.draw.hyperbolicupperhalfplane as hup
 import sympy as sym
+import numpy as np
 
 def Edist(p,q):
-    return sym.sqrt((sym.re(p)-sym.re(q))**2+(sym.im(p)-sym.im(q))**2)
+    return abs(complex(p)-complex(q))
 
 def tooclose(point, pointset, tolerance):
     """
     returns True if point is within distance tolerance of some point in pointset
     """
-    return any(sym.N(Edist(point,p))<=tolerance for p in pointset)
+    point=complex(point)
+    tolerance2=tolerance**2 # compare squared distances to avoid square roots
+    for p in pointset:
+        d=point-complex(p)
+        if d.real*d.real+d.imag*d.imag<=tolerance2:
+            return True
+    return False
+
+def _mobiusarray(matrices):
+    """
+    matrices is a dictionary taking generator i to the entries (a,b,c,d) of a matrix.
+    Return complex array whose row 2*(i-1) is the matrix of generator i and row 2*i-1 is the matrix of its inverse.
+    """
+    reps=np.empty((2*len(matrices),4),dtype=np.complex128)
+    for i in matrices:
+        a,b,c,d=matrices[i]
+        reps[2*(i-1)]=(a,b,c,d)
+        reps[2*i-1]=(d,-b,-c,a)
+    return reps
+
+def _rowindices(gens):
+    """
+    Rows of _mobiusarray corresponding to the letters of gens.
+    """
+    return np.array([2*(abs(x)-1)+(x<0) for x in gens],dtype=np.int64)
+
+def _composemobius(reps,rows,p):
+    """
+    Apply to p the mobius transformations in rows of reps, in order.
+    """
+    for k in rows:
+        p=(reps[k,0]*p+reps[k,1])/(reps[k,2]*p+reps[k,3])
+    return p
+
+_longprefix=128 # below this many letters compiling is not repaid
+
+@functools.lru_cache(maxsize=None)
+def _compiledcomposemobius():
+    """
+    _composemobius compiled by numba, or None if numba is not available.
+    numba is only imported the first time a long prefix is composed, so importing this module stays cheap.
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.njit(_composemobius)
+
+def _applymobius(reps,rows,p):
+    """
+    _composemobius(reps,rows,p), compiled for long lists of rows when numba is available.
+    """
+    if len(rows)>=_longprefix:
+        kernel=_compiledcomposemobius()
+        if kernel is not None:
+            return kernel(reps,rows,p)
+    return _composemobius(reps,rows,p)
 
 def EuclideanVertPos(vert, rank,representation={}):
     """
@@ -26,40 +84,65 @@ def EuclideanVertPos(vert, rank,representation={}):
     # default representation is i->(v->v+(cos((i-1)pi/rank),sin((i-1)pi/rank)))
     if type(vert)!=tuple:
         vert=(vert,)
-    abelianization=dict.fromkeys(range(1,rank+1),0)
-    for i in range(len(vert)-1):
-        abelianization[abs(vert[i])]+=vert[i]/abs(vert[i])
-    theta=sym.pi/rank
-    majorposition=0
-    for i in abelianization:
-        majorposition+=abelianization[i]*sym.exp(sym.I*(i-1)*theta)
-    minorposition=complex((vert[-1]/abs(vert[-1]))*.25*sym.exp(sym.I*theta*(abs(vert[-1])-1)))
+    letters=np.fromiter(vert[:-1],dtype=np.int64,count=len(vert)-1)
+    abelianization=np.bincount(np.abs(letters)-1,weights=np.sign(letters),minlength=rank)
+    roots=_rootsofunity(rank)
+    majorposition=abelianization@roots
+    minorposition=(1 if vert[-1]>0 else -1)*.25*roots[abs(vert[-1])-1]
     return complex(majorposition+minorposition)
 
-        
+@functools.lru_cache(maxsize=None)
+def _rootsofunity(rank):
+    """
+    Array whose i-th entry is exp(i*pi*I/rank).
+    """
+    roots=np.exp(1j*np.pi*np.arange(rank)/rank)
+    roots.flags.writeable=False # shared between calls
+    return roots
+
+
+def _discarray(rank,representation=None):
+    """
+    _mobiusarray of a representation into the isometries of the Poincare disc, given by pairs (a,b).
+    """
+    if representation==None:
+        return _standardarray(rank,'disc')
+    rep=dict((i,(complex(representation[i][0]),complex(representation[i][1]))) for i in representation)
+    return _mobiusarray(dict((i,(a,b,b.conjugate(),a.conjugate())) for i,(a,b) in rep.items()))
+
+def _upperarray(rank,representation=None):
+    """
+    _mobiusarray of a representation into the isometries of the upper half plane.
+    """
+    if representation==None:
+        return _standardarray(rank,'upper')
+    return _mobiusarray(hup.numericrep(representation))
+
+@functools.lru_cache(maxsize=None)
+def _standardarray(rank,model):
+    """
+    _mobiusarray of the standard representation in the given model, with the inverse matrices, computed once for each rank.
+    """
+    if model=='disc':
+        reps=_discarray(rank,hdisc.standardrep(rank))
+    else:
+        reps=_upperarray(rank,hup.standardrep(rank))
+    reps.flags.writeable=False # shared between calls
+    return reps
+
 def DiscVertPos(vert, rank, representation=None):
     """
     Calculuate coordinates of vertex in Poincare disc.
     representation is dictionary containing images of the generators of free group of
     the given rank in the isometry group of the plane.
     """
-    if representation==None:
-        representation=hdisc.standardrep(rank)
     if type(vert)!=tuple:
         vert=(vert,)
+    reps=_discarray(rank,representation)
     gens=list(vert)
-    last=gens.pop()
-    if last<0:
-        position=.33*hdisc.invmobius(representation[-last],0)
-    else:
-        position=.33*hdisc.mobius(representation[last],0)
-    while gens!=[]:
-        nextgen=gens.pop()
-        if nextgen<0:
-            position=hdisc.invmobius(representation[-nextgen],position)
-        else:
-            position=hdisc.mobius(representation[nextgen],position)
-    return sym.N(position)
+    last=_rowindices([gens.pop()])[0]
+    position=.33*hup.numericmobius(*reps[last],0)
+    return complex(_applymobius(reps,_rowindices(gens[::-1]),complex(position)))
 
         
 
@@ -69,30 +152,86 @@ def UpperVertPos(vert, rank, representation=None):
     representation is dictionary containing images of the generators of free group of
     the given rank in the isometry group of the plane.
     """
-    if representation==None:
-        representation=hup.standardrep(rank)
     if type(vert)!=tuple:
         vert=(vert,)
+    reps=_upperarray(rank,representation)
     gens=list(vert)
-    last=gens.pop()
-    if last<0:
-        position=hup.findPoint(sym.I,hup.invmobius(representation[-last],sym.I),.6)
-    else:
-        position=hup.findPoint(sym.I,hup.mobius(representation[last],sym.I),.6)
-    while gens!=[]:
-        nextgen=gens.pop()
-        if nextgen<0:
-            position=hup.invmobius(representation[-nextgen],position)
-        else:
-            position=hup.mobius(representation[nextgen],position)
-    return complex(position)
+    last=_rowindices([gens.pop()])[0]
+    position=hup.findPoint(1j,hup.numericmobius(*reps[last],1j),.6)
+    return complex(_applymobius(reps,_rowindices(gens[::-1]),complex(position)))
+
+def _vertpositions(verts,start,step,finish):
+    """
+    Positions of all of verts, computed so that vertices with a common prefix share the work for that prefix.
+    start is the state for the empty prefix, step(state,letter) is the state for a prefix extended by letter, and finish(state,letter) is the position of the vertex with given last letter whose prefix has the given state.
+    Returns a dictionary with the same order as verts.
+    """
+    tuples=dict((vert,vert if type(vert)==tuple else (vert,)) for vert in verts)
+    positions={}
+    prefix=[]
+    states=[start] # states[i] is the state of prefix[:i]
+    for vert in sorted(tuples,key=tuples.get):
+        t=tuples[vert]
+        common=0
+        while common<len(prefix) and common<len(t)-1 and prefix[common]==t[common]:
+            common+=1
+        del prefix[common:]
+        del states[common+1:]
+        for x in t[common:-1]:
+            states.append(step(states[-1],x))
+            prefix.append(x)
+        positions[vert]=finish(states[-1],t[-1])
+    return dict((vert,positions[vert]) for vert in verts)
+
+def _matrixproduct(M,N):
+    return (M[0]*N[0]+M[1]*N[2],M[0]*N[1]+M[1]*N[3],M[2]*N[0]+M[3]*N[2],M[2]*N[1]+M[3]*N[3])
+
+def _lettermatrices(matrices):
+    """
+    matrices is a dictionary taking generator i to the entries (a,b,c,d) of a matrix.
+    Return the dictionary taking each generator and inverse generator to the entries of its matrix.
+    """
+    lettermatrices=dict()
+    for i in matrices:
+        a,b,c,d=matrices[i]
+        lettermatrices[i]=(a,b,c,d)
+        lettermatrices[-i]=(d,-b,-c,a)
+    return lettermatrices
+
+def EuclideanVertPositions(verts, rank):
+    """
+    Dictionary of EuclideanVertPos(vert,rank) for vert in verts.
+    """
+    roots=_rootsofunity(rank)
+    return _vertpositions(verts,0j,lambda z,x: z+(1 if x>0 else -1)*roots[abs(x)-1],lambda z,x: complex(z+(1 if x>0 else -1)*.25*roots[abs(x)-1]))
+
+def DiscVertPositions(verts, rank, representation=None):
+    """
+    Dictionary of DiscVertPos(vert,rank,representation) for vert in verts.
+    """
+    if representation==None:
+        representation=hdisc.standardrep(rank)
+    rep=dict((i,(complex(representation[i][0]),complex(representation[i][1]))) for i in representation)
+    M=_lettermatrices(dict((i,(a,b,b.conjugate(),a.conjugate())) for i,(a,b) in rep.items()))
+    startpoints=dict((x,.33*hup.numericmobius(*M[x],0)) for x in M)
+    return _vertpositions(verts,(1,0,0,1),lambda N,x: _matrixproduct(N,M[x]),lambda N,x: complex(hup.numericmobius(*N,startpoints[x])))
+
+def UpperVertPositions(verts, rank, representation=None):
+    """
+    Dictionary of UpperVertPos(vert,rank,representation) for vert in verts.
+    """
+    if representation==None:
+        representation=hup.standardrep(rank)
+    M=_lettermatrices(hup.numericrep(representation))
+    startpoints=dict((x,hup.findPoint(1j,hup.numericmobius(*M[x],1j),.6)) for x in M)
+    return _vertpositions(verts,(1,0,0,1),lambda N,x: _matrixproduct(N,M[x]),lambda N,x: complex(hup.numericmobius(*N,startpoints[x])))
 
 def draw(G,layout=None,rank=None, representation=None,center=None):
     pos={}
     if rank==None:
         rank=G.rank
     if layout=="Euclidean":
-        pos=dict((vert,EuclideanVertPos(vert, rank, representation)) for vert in G)
+        pos=EuclideanVertPositions(G, rank)
         # jiggle vertices to make positions unique
         positions=set([])
         for vert in pos:
@@ -104,7 +243,7 @@ def draw(G,layout=None,rank=None, representation=None,center=None):
     elif layout=="upper":
         if representation==None:
             representation=hup.standardrep(rank)
-        pos=dict((vert,UpperVertPos(vert, rank, representation)) for vert in G)
+        pos=UpperVertPositions(G, rank, representation)
         if center==None:
             vertsandmasses=[(pos[p],1) for p in pos]
             center=hup.centerofmass(vertsandmasses)[0]
@@ -119,7 +258,7 @@ def draw(G,layout=None,rank=None, representation=None,center=None):
     elif layout=="disc":
         if representation==None:
             representation=hdisc.standardrep(rank)
-        pos=dict((vert,DiscVertPos(vert, rank, representation)) for vert in G)
+        pos=DiscVertPositions(G, rank, representation)
         if center==None:
             vertsandmasses=[(pos[p],1) for p in pos]
             center=hdisc.centerofmass(vertsandmasses)[0]
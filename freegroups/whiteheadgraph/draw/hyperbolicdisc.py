@@ -1,5 +1,9 @@
 from __future__ import division
 import sympy as sym
+import math
+import cmath
+import functools
+import numpy as np
 
 
 def cnorm2(z):
@@ -15,30 +19,37 @@ def invmobius(pairormatrix,p):
     a=pairormatrix[0]
     b=pairormatrix[1]
     return mobius((sym.conjugate(a), -b), p)
+
+# Numerical versions of mobius and invmobius, for complex a,b and complex point p.
+def numericmobius(a,b,p):
+    return (a*p+b)/(b.conjugate()*p+a.conjugate())
+
+def numericinvmobius(a,b,p):
+    return numericmobius(a.conjugate(),-b,p)
         
 def dist(p,q):
     p=complex(p)
     q=complex(q)
-    if any(part==float('inf') for part in [sym.re(p),sym.im(p),sym.re(q),sym.im(q)]):
+    if cmath.isinf(p) or cmath.isinf(q):
         return float('inf')
     else:
         dif=p-q
-        return sym.acosh(1+2*(sym.re(dif)**2+sym.im(dif)**2)/((1 - sym.re(p)**2 - sym.im(p)**2)*(1- q.real**2 - q.imag**2)))
+        return math.acosh(1+2*(dif.real**2+dif.imag**2)/((1 - p.real**2 - p.imag**2)*(1- q.real**2 - q.imag**2)))
 
 def direction(p):
     if p==0:
         return float('nan')
     else:
         p=complex(p)
-        return p/sym.sqrt(sym.re(p)**2 + sym.im(p)**2)
+        return p/abs(p)
     
 
 def EuclideanNorm(d):
     """
     Euclidean Norm of point hyperbolic distance d from origin
     """
-    x=(sym.cosh(d)-1)/2
-    return sym.sqrt(sym.N(x/(1+x)))
+    x=(math.cosh(d)-1)/2
+    return math.sqrt(x/(1+x))
 
 def findPoint(p,q,d):
     """
@@ -46,13 +57,14 @@ def findPoint(p,q,d):
     """
     p=complex(p)
     q=complex(q)
+    d=float(d)
     if p==q or d==0:
         return p
     else:
         forward=1 if d>=0 else -1
-        Q=complex(mobius((1,-p),q))
+        Q=numericmobius(1,-p,q)
         newpoint=forward*EuclideanNorm(d)*direction(Q)
-        return complex(invmobius((1,-p),newpoint))
+        return numericinvmobius(1,-p,newpoint)
 
 def EuclideanBall(Hcenter, Hradius):
     if Hcenter==0:
@@ -68,6 +80,13 @@ def standardrep(rank):
     """
     representation of free group of rank r as hyperbolic isometries
     """
+    return dict(_standardrep(rank))
+
+@functools.lru_cache(maxsize=None)
+def _standardrep(rank):
+    """
+    Computes standardrep once for each rank. The matrices are immutable since they are shared between calls.
+    """
     rep=dict.fromkeys(range(1,rank+1))
     theta=sym.pi/rank
     outradius=sym.cos(theta/2)/(1+sym.sin(theta/2))
@@ -79,26 +98,46 @@ def standardrep(rank):
         rot=sym.Matrix([[sym.exp(sym.I*(i-1)*theta/2),0],[0,sym.exp(-sym.I*(i-1)*theta/2)]])
         ROT=sym.Matrix([[sym.exp(-sym.I*(i-1)*theta/2),0],[0,sym.exp(sym.I*(i-1)*theta/2)]])
         newM=rot*base*ROT
-        rep[i]=sym.Matrix([[sym.N(sym.simplify(newM[0])),sym.N(sym.simplify(newM[1]))],[sym.N(sym.simplify(newM[2])),sym.N(sym.simplify(newM[3]))]])
+        rep[i]=sym.ImmutableMatrix([[sym.N(sym.simplify(newM[0])),sym.N(sym.simplify(newM[1]))],[sym.N(sym.simplify(newM[2])),sym.N(sym.simplify(newM[3]))]])
     return rep
 
 def centerofmass(pointsandmasses):
     """
     return the center of mass of a list of points in the disc
+    Points are merged into the running center of mass one at a time.
     """
     if len(pointsandmasses)==0:
         return (complex(0) , 0)
-    if len(pointsandmasses)==1:
-       return(pointsandmasses[0])
-    else:
-        p1=centerofmass([pointsandmasses[i] for i in range(0,len(pointsandmasses),2)])
-        p2=centerofmass([pointsandmasses[i] for i in range(1,len(pointsandmasses),2)])
-        if (p1[1]+p2[1])==0:
-            return (complex(0) , 0)
+    if len(pointsandmasses)>largecenterofmass:
+        return discmedian(pointsandmasses)
+    points=iter(pointsandmasses)
+    p,m=next(points)
+    for q,n in points:
+        if m+n==0:
+            p,m=complex(0),0
         else:
-            return (findPoint(p1[0],p2[0],sym.N((p2[1]/(p1[1]+p2[1]))*dist(p1[0],p2[0]))) , p1[1]+p2[1])
-        
-    
-            
-    
+            p,m=findPoint(p,q,(n/(m+n))*dist(p,q)),m+n
+    return (p,m)
 
+# centerofmass of more than this many points is approximated by discmedian
+largecenterofmass=500
+
+def discmedian(pointsandmasses,iterations=50):
+    """
+    Approximate weighted geometric median of a list of points in the disc, with their total mass.
+    Each Weiszfeld step is taken after moving the current estimate to 0, so the result does not depend on the position of the points in the disc.
+    """
+    points=np.array([complex(p) for p,m in pointsandmasses])
+    masses=np.array([float(m) for p,m in pointsandmasses])
+    totalmass=sum(m for p,m in pointsandmasses)
+    if masses.sum()==0:
+        return (complex(0), totalmass)
+    center=complex((masses*points).sum()/masses.sum())
+    for i in range(iterations):
+        z=(points-center)/(1-np.conj(center)*points) # points moved by an isometry taking center to 0
+        weights=masses/(np.abs(z)+1e-12)
+        step=complex((weights*z).sum()/weights.sum())
+        center=(step+center)/(1+center.conjugate()*step)
+        if abs(step)<1e-12:
+            break
+    return (center, totalmass)
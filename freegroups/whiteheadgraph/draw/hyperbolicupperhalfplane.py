@@ -1,5 +1,8 @@
 from __future__ import division
 import sympy as sym
+import math
+import cmath
+import functools
 import grouptheory.freegroups.whiteheadgraph.draw.hyperbolicdisc as hdisc
 
 
@@ -27,15 +30,45 @@ def mobius(M,p):
             return numerator/denominator
 
 def invmobius(M,p):
+    if isinstance(M,sym.ImmutableMatrix): # eg from standardrep
+        return mobius(_adjugate(M), p)
     return mobius(sym.Matrix([[M[3],-M[1]],[-M[2],M[0]]]), p)
+
+@functools.lru_cache(maxsize=None)
+def _adjugate(M):
+    return sym.ImmutableMatrix([[M[3],-M[1]],[-M[2],M[0]]])
+
+# Numerical versions of mobius and invmobius, for a matrix given by complex entries a,b,c,d and a complex point p. The point at infinity is complex('inf').
+_infinity=complex(float('inf'),0)
+
+def numericmobius(a,b,c,d,p):
+    if cmath.isinf(p):
+        if c==0:
+            return _infinity
+        else:
+            return a/c
+    denominator=c*p+d
+    if denominator==0:
+        return _infinity
+    else:
+        return (a*p+b)/denominator
+
+def numericinvmobius(a,b,c,d,p):
+    return numericmobius(d,-b,-c,a,p)
+
+def numericrep(representation):
+    """
+    Return dictionary of the matrices of representation as tuples (a,b,c,d) of complex numbers.
+    """
+    return dict((i,tuple(complex(x) for x in representation[i])) for i in representation)
         
 def dist(p,q):
     p=complex(p)
     q=complex(q)
-    if sym.im(p)==0 or sym.im(q)==0 or any(part==sym.oo for part in [sym.re(p), sym.re(q), sym.im(p), sym.im(q)]):
-        return sym.oo
+    if p.imag==0 or q.imag==0 or cmath.isinf(p) or cmath.isinf(q):
+        return float('inf')
     else:
-        return sym.acosh(1+((sym.re(q)-sym.re(p))**2+(sym.im(q)-sym.im(p))**2)/(2*sym.im(p)*sym.im(q)))
+        return math.acosh(1+((q.real-p.real)**2+(q.imag-p.imag)**2)/(2*p.imag*q.imag))
 
 
 def findPoint(p,q,d):
@@ -44,30 +77,31 @@ def findPoint(p,q,d):
     """
     p=complex(p)
     q=complex(q)
+    d=float(d)
     if p==q or d==0:
         return p
     # Find matrix T for mobius transform that takes p to I and q to the imaginary axis above I
     else:
-        Movep=sym.Matrix([[1,-p.real],[0,p.imag]])
-        Q=complex(mobius(Movep,q))
+        Q=numericmobius(1,-p.real,0,p.imag,q)
         if Q.real==0 and Q.imag>1:
-            Rot=sym.Matrix([[1,0],[0,1]])
+            Rot=(1,0,0,1)
         elif Q.real==0 and Q.imag<1:
-            Rot=sym.Matrix([[0,1],[-1,0]])
-        elif Q.real>0:
-            x=Q.real
-            y=Q.imag
-            a=(x**2+y**2-1)/(2*x)
-            r=sym.sqrt(1+a**2)
-            Rot=sym.Matrix([[(a+r)/sym.sqrt(1+(a+r)**2), 1/sym.sqrt(1+(a+r)**2)],[-1/sym.sqrt(1+(a+r)**2),(a+r)/sym.sqrt(1+(a+r)**2)]])
+            Rot=(0,1,-1,0)
         else:
-            x=-Q.real/(Q.real**2+Q.imag**2)
-            y=Q.imag/(Q.real**2+Q.imag**2)
+            if Q.real>0:
+                x=Q.real
+                y=Q.imag
+            else:
+                x=-Q.real/(Q.real**2+Q.imag**2)
+                y=Q.imag/(Q.real**2+Q.imag**2)
             a=(x**2+y**2-1)/(2*x)
-            r=sym.sqrt(1+a**2)
-            Rot=sym.Matrix([[0,1],[-1,0]])*sym.Matrix([[(a+r)/sym.sqrt(1+(a+r)**2), 1/sym.sqrt(1+(a+r)**2)],[-1/sym.sqrt(1+(a+r)**2),(a+r)/sym.sqrt(1+(a+r)**2)]])
-        T=Rot*Movep            
-        return complex(invmobius(T,sym.exp(d)*sym.I))
+            r=math.sqrt(1+a**2)
+            n=math.sqrt(1+(a+r)**2)
+            Rot=((a+r)/n,1/n,-1/n,(a+r)/n)
+            if Q.real<0:
+                Rot=(Rot[2],Rot[3],-Rot[0],-Rot[1]) # [[0,1],[-1,0]]*Rot
+        T=(Rot[0],-Rot[0]*p.real+Rot[1]*p.imag,Rot[2],-Rot[2]*p.real+Rot[3]*p.imag) # Rot*[[1,-p.real],[0,p.imag]]
+        return complex(numericinvmobius(*T,cmath.exp(d)*1j))
         
 
 def EuclideanBall(Hcenter, Hradius):
@@ -87,28 +121,43 @@ def standardrep(rank):
     """
     representation of free group of rank r as hyperbolic isometries
     """
-    rep=dict.fromkeys(range(1,rank+1))
+    return dict(_standardrep(rank))
+
+@functools.lru_cache(maxsize=None)
+def _standardrep(rank):
+    """
+    Computes standardrep once for each rank. The matrices are immutable since they are shared between calls.
+    """
     discrep=hdisc.standardrep(rank)
-    for i in rep:
-        newM=sym.Matrix([[sym.I,-1],[-1,sym.I]])*discrep[i]*sym.Matrix([[sym.I,1],[1,sym.I]])
-        rep[i]=sym.Matrix([[sym.N(sym.simplify(newM[0])),sym.N(sym.simplify(newM[1]))],[sym.N(sym.simplify(newM[2])),sym.N(sym.simplify(newM[3]))]])
-    return rep
+    return dict((i,sym.ImmutableMatrix([[sym.N(x) for x in row] for row in _conjugatetoupper(*discrep[i])])) for i in range(1,rank+1))
+
+def _conjugatetoupper(a,b,c,d):
+    """
+    Entries of the product [[I,-1],[-1,I]]*[[a,b],[c,d]]*[[I,1],[1,I]], taking the disc to the upper half plane.
+    """
+    I=sym.I
+    return [[-a+I*b-I*c-d, I*a-b-c-I*d],[-I*a-b-c+I*d, -a-I*b+I*c-d]]
 
 def centerofmass(pointsandmasses):
     """
     return the center of mass of a list of points in the disc
+    Points are merged into the running center of mass one at a time.
     """
     if len(pointsandmasses)==0:
         return (sym.I , 0)
-    if len(pointsandmasses)==1:
-       return(pointsandmasses[0])
-    else:
-        p1=centerofmass([pointsandmasses[i] for i in range(0,len(pointsandmasses),2)])
-        p2=centerofmass([pointsandmasses[i] for i in range(1,len(pointsandmasses),2)])
-        if (p1[1]+p2[1])==0:
+    if len(pointsandmasses)>hdisc.largecenterofmass: # approximate by the median, computed in the disc
+        center,mass=hdisc.discmedian([((complex(p)-1j)/(complex(p)+1j),m) for p,m in pointsandmasses])
+        if mass==0:
             return (sym.I , 0)
+        return (1j*(1+center)/(1-center), mass)
+    points=iter(pointsandmasses)
+    p,m=next(points)
+    for q,n in points:
+        if m+n==0:
+            p,m=sym.I,0
         else:
-            return (findPoint(p1[0],p2[0],sym.N((p2[1]/(p1[1]+p2[1]))*dist(p1[0],p2[0]))) , p1[1]+p2[1])
+            p,m=findPoint(p,q,(n/(m+n))*dist(p,q)),m+n
+    return (p,m)
         
     
             
@@ -86,14 +86,8 @@ class OrderedMultiGraph(nx.MultiGraph):
         # Start with key=0 and if necessary count up until find unused key
         # Note: we want key to be unique among all edge keys, not just u to v edges
         # this is more restrictive than in networkx.MultiGraph.add_edge
-        if u in list(self.nodes()):
-            uisnew=False
-        else:
-            uisnew=True
-        if v in list(self.nodes()):
-            visnew=False
-        else:
-            visnew=True
+        uisnew=u not in self
+        visnew=v not in self
             
         if key==None:
             key=0
@@ -175,24 +169,34 @@ class OrderedMultiGraph(nx.MultiGraph):
         """
         find the connected component of vertex1 in the graph-vertex2
         """
-        ondeck = set([vertex1])
-        seen = set()
-        while ondeck!=set():
-            nextvert = ondeck.pop()
-            nextneighbors = set(self.neighbors(nextvert))-set([vertex2])
-            ondeck |= nextneighbors
-            ondeck -= seen
-            seen.add(nextvert)
-        return seen
+        return self._reachable(vertex1,set([vertex2]))
     
     def connected_components_minus_two_vertices(self,vertex1, vertex2):
         """
         Connected components of W-{v1,v2}
         """
-        #G=self.copy()
-        G=nx.MultiGraph(self)
-        G.remove_nodes_from([vertex1,vertex2])
-        return [concom for concom in nx.connected_components(G)]  
+        # search in place rather than copying the graph and deleting the vertices
+        seen=set([vertex1,vertex2])
+        components=[]
+        for vert in self:
+            if vert not in seen:
+                component=self._reachable(vert,seen)
+                seen|=component
+                components.append(component)
+        return components
+
+    def _reachable(self,vertex,avoid):
+        """
+        Set of vertices joined to vertex by a path that does not pass through any vertex in the set avoid.
+        """
+        component=set([vertex])
+        ondeck=[vertex]
+        while ondeck:
+            for neighbor in self.neighbors(ondeck.pop()):
+                if neighbor not in component and neighbor not in avoid:
+                    component.add(neighbor)
+                    ondeck.append(neighbor)
+        return component
       
     def is_cut_vertex(self,vertex):
         """
@@ -201,14 +205,22 @@ class OrderedMultiGraph(nx.MultiGraph):
         if self.incident_edges(vertex)==[]:
             return True
         else:
-            aneighbor=self.neighbors(vertex)[0]
+            aneighbor=next((neighbor for neighbor in self.neighbors(vertex) if neighbor!=vertex), vertex) # ignore loops at vertex
             return self.connected_component_minus_a_vertex(aneighbor, vertex)!=(set(list(self.nodes()))-set([vertex]))
             
     def find_cut_vertex(self):
-        for vert in list(self.nodes()):
-            if self.is_cut_vertex(vert):
+        """
+        Return the first vertex that is_cut_vertex, or None.
+        """
+        if len(self)==0:
+            return None
+        if len(self)==1 or not self.is_connected(): # then every vertex is a cut vertex
+            return next(iter(self))
+        cutvertices=set(nx.articulation_points(self)) # one linear time search instead of a search for each vertex
+        for vert in self:
+            if vert in cutvertices:
                 return vert
-        return None                
+        return None
             
     def is_circle(self):
         if any(self.valence(vertex)!=2 for vertex in list(self.nodes())):
@@ -88,7 +88,7 @@ def cutpairtest(maxlength,verbose,debug,randomautomorphismlength,examplename,fre
         
 def testall(maxlength=30, randomautomorphismlength=0,verbose=False,debug=False):
     
-    if all([cutpairtest(maxlength,verbose,debug,randomautomorphismlength,k,knownexamples[k]['freegroup'],knownexamples[k]['wordlist'],knownexamples[k]['splitsfreely'],knownexamples[k]['iscircle'],knownexamples[k]['isrigid'],knownexamples[k]['cutpoints'],knownexamples[k]['uncrossed']) for k in knownexamples]):
+    if all(cutpairtest(maxlength,verbose,debug,randomautomorphismlength,k,knownexamples[k]['freegroup'],knownexamples[k]['wordlist'],knownexamples[k]['splitsfreely'],knownexamples[k]['iscircle'],knownexamples[k]['isrigid'],knownexamples[k]['cutpoints'],knownexamples[k]['uncrossed']) for k in knownexamples):
         print("Found all expected cut points/pairs")
     else:
         print("Failed to find expected cut points/pairs")
@@ -2,15 +2,18 @@ import grouptheory.freegroups.freegroup as freegroup
 import grouptheory.freegroups.AutF as aut
 import grouptheory.group as group
 import copy
+import random
+import concurrent.futures
+import functools
 import grouptheory.freegroups.whiteheadgraph as wg
-from grouptheory.freegroups.whiteheadgraph.test.knownexamples import *
+from grouptheory.freegroups.whiteheadgraph.test.knownexamples import knownexamples
 
 
 
 def rjsjtest(maxlength,verbose,debug,randomautomorphismlength,examplename,freegroup,wordlist,splitsfreely):
-    nonefailed=True
     if splitsfreely:
-        return nonfailed
+        return True
+    nonefailed=True
     # take a known example and mix it up with an automorphism alpha
     F=freegroup
     rank=F.rank
@@ -20,23 +23,38 @@ def rjsjtest(maxlength,verbose,debug,randomautomorphismlength,examplename,freegr
         print("Trying example ", examplename, " changed by automorphism:\n", alpha)
     newwordlist=[alpha(w) for w in wordlist]
     gamma, wordmap=F.get_RJSJ(newwordlist, withmap=True)
-    minimizedwordlist=[]
-    for (v,w,p) in wordmap:
-        minimizedwordlist.append(gamma.localgroup(v).get_inclusion(F)(w))
     if not F.is_RJSJ(wordmap,gamma,verbose=verbose):
         if verbose:
             print("Error computing RJSJ for", examplename,".")
         nonefailed=False
         if debug:
             print(gamma, wordmap)
+            print("Images of the words in F:", [gamma.localgroup(v).get_inclusion(F)(w) for (v,w,p) in wordmap])
             print('********************************')
 
     if verbose and nonefailed:
         print("Correctly found RJSJ for",examplename,".")
     return nonefailed
         
-def testall(maxlength=30, randomautomorphismlength=0,verbose=False, debug=False):
-    if all([rjsjtest(maxlength,verbose,debug,randomautomorphismlength,k,knownexamples[k]['freegroup'],knownexamples[k]['wordlist'],knownexamples[k]['splitsfreely']) for k in knownexamples]):
+def _rjsjtestexample(maxlength,verbose,debug,randomautomorphismlength,examplename,seed=None):
+    """
+    rjsjtest for knownexamples[examplename]. Only the name is passed so this can run in a worker process.
+    If seed is given the random module is seeded with it first, so results do not depend on which worker runs the example.
+    """
+    if seed is not None:
+        random.seed(seed)
+    example=knownexamples[examplename]
+    return rjsjtest(maxlength,verbose,debug,randomautomorphismlength,examplename,example['freegroup'],example['wordlist'],example['splitsfreely'])
+
+def testall(maxlength=30, randomautomorphismlength=0,verbose=False, debug=False, max_workers=None, seed=None):
+    """
+    Run rjsjtest on all the known examples in a pool of max_workers processes, defaulting to the number of cpus.
+    """
+    assert rjsjtest(maxlength,verbose,debug,randomautomorphismlength,'splits freely',None,[],True) # no example splits freely, so check that case here
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as ex:
+        allpassed=all(ex.map(functools.partial(_rjsjtestexample,maxlength,verbose,debug,randomautomorphismlength,seed=seed),knownexamples))
+        ex.shutdown(cancel_futures=True) # after a failure, don't run the examples that have not started
+    if allpassed:
         print("Found expected rJSJ's.")
     else:
         print("Some rJSJ test failed.")
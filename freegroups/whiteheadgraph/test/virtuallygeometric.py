@@ -44,7 +44,7 @@ def testone(k,maxlength=30, randomautomorphismlength=0,verbose=False, debug=Fals
         print("Virtual geometrictiy test failed.")
 
 def testall(maxlength=30, randomautomorphismlength=0,verbose=False, debug=False):
-    if all([vgtest(maxlength,verbose,debug,randomautomorphismlength,k,knownexamples[k]['freegroup'],knownexamples[k]['wordlist'],knownexamples[k]['virtuallygeometric']) for k in knownexamples]):
+    if all(vgtest(maxlength,verbose,debug,randomautomorphismlength,k,knownexamples[k]['freegroup'],knownexamples[k]['wordlist'],knownexamples[k]['virtuallygeometric']) for k in knownexamples):
         print("Found expected virtual geometricity in all examples.")
     else:
         print("Some virtual geometrictiy tests failed.")
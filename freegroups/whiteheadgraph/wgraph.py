@@ -46,31 +46,25 @@ class WGraph(omg.OrderedMultiGraph):
             self.add_vertex(i)
             self.splicemaps[i]=[]
             
-        edgecounter=0
         if verbose:
             print("Constructing Whitehead Graph")
-            manywords=bool(len(self.wordlist)>999)
-            if manywords:
-                pass
-                #wgfish=ProgressFish(total=len(self.wordlist))
-        for i in range(len(self.wordlist)):
-            w=self.wordlist[i]
-            if verbose and manywords:
-                pass
-                #wgfish.animate(amount=i)
-            if len(w)>0:
-                firstplace=len(self.splicemaps[-w.letters[0]])
-                self.splicemaps[-w.letters[0]]+=[None]
-                if len(w)>1:
-                    for i in range(1,len(w)):
-                        self.add_edge(-w.letters[i-1],w.letters[i],'e'+str(edgecounter))
-                        edgecounter+=1
-                        self.splicemaps[w.letters[i]]+=[len(self.splicemaps[-w.letters[i]])]
-                        self.splicemaps[-w.letters[i]]+=[len(self.splicemaps[w.letters[i]])-1]
-                self.add_edge(-w.letters[-1],w.letters[0],'e'+str(edgecounter))
+        splicemaps=self.splicemaps
+        edgecounter=0
+        for w in self.wordlist:
+            letters=w.letters
+            if letters:
+                first=letters[0]
+                firstplace=len(splicemaps[-first])
+                splicemaps[-first].append(None)
+                for previous,x in zip(letters,letters[1:]):
+                    self.add_edge(-previous,x,'e'+str(edgecounter))
+                    edgecounter+=1
+                    splicemaps[x].append(len(splicemaps[-x]))
+                    splicemaps[-x].append(len(splicemaps[x])-1)
+                self.add_edge(-letters[-1],first,'e'+str(edgecounter))
                 edgecounter+=1
-                self.splicemaps[w.letters[0]]+=[firstplace]
-                self.splicemaps[-w.letters[0]][firstplace]=len(self.splicemaps[w.letters[0]])-1
+                splicemaps[first].append(firstplace)
+                splicemaps[-first][firstplace]=len(splicemaps[first])-1
 
     def inv(self,vert):
         return -vert
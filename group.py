@@ -1,5 +1,6 @@
-import copy
 import random
+import functools
+import numpy as np
 from numpy import log, ceil, sqrt, sign
 import networkx as nx
 
@@ -135,21 +136,15 @@ class FGGroup(object):
         """
         cyclic_reduce(w) is a cyclically reduced word conjugate (as a free group element) to w.  Use cyclic_reducer if you also want the conjugating element.
         """
-        w1=copy.copy(w.letters)
-        while len(w1) > 2 and w1[0]+w1[-1]==0:
-            w1=w1[1:-1]
-        return self.word(w1)
+        start,end=_cyclicreductionbounds(w.letters)
+        return self.word(w.letters[start:end])
 
     def cyclic_reducer(self,w):
         """
         return w0,w1 such that w1 is cyclically reduced and w0**(-1)w1w0=w.  Use cyclic_reduce if you don't care about w0.
         """
-        w1=copy.copy(w.letters)
-        w0=[]
-        while len(w1) > 2 and w1[0]+w1[-1]==0:
-            w0.insert(0,w1[-1])
-            w1=w1[1:-1]
-        return self.word(w0), self.word(w1)
+        start,end=_cyclicreductionbounds(w.letters)
+        return self.word(w.letters[end:]), self.word(w.letters[start:end])
 
     def word(self,letters):
         """
@@ -157,6 +152,22 @@ class FGGroup(object):
         """
         return Word(letters, self)
 
+    def gen(self,i):
+        """
+        The word consisting of the single letter i, a generator or inverse generator.
+        These words are made once and shared, so pop raises ValueError on them. Use self.word([i]) for a word that can be modified.
+        """
+        try:
+            return self._genwords[i]
+        except AttributeError:
+            self._genwords=dict()
+        except KeyError:
+            pass
+        w=self.word([i])
+        w._shared=True
+        self._genwords[i]=w
+        return w
+
     def is_subgroup(self,G):
         """
         Check if group is a subgroup of G.
@@ -175,6 +186,13 @@ class FGGroup(object):
         If self is a subgroup of G return the inclusion homomorphism, else error.
         """
         # As in isSubgroup, nothing intelligent here. Subgroups are defined with an inclusion into a supergroup.
+        # The inclusions are fixed once the subgroups are constructed, so each one is computed once and shared. They are keyed by id(G), which stays valid because the inclusion keeps G as its codomain.
+        try:
+            return self._inclusions[id(G)]
+        except AttributeError:
+            self._inclusions=dict()
+        except KeyError:
+            pass
         currentgroup=self
         inclusionchain=Automorphism(self)
         while currentgroup is not G:
@@ -183,22 +201,27 @@ class FGGroup(object):
                 currentgroup=currentgroup.supergroup
             except AttributeError:
                  raise ValueError("not a known supergroup")
+        self._inclusions[id(G)]=inclusionchain
         return inclusionchain
 
+    def letterlist(self):
+        """
+        List of the generators followed by their inverses, as numbers. The list is shared, so do not modify it.
+        """
+        # Computed on first use rather than in __init__, because some subclasses do not call FGGroup.__init__.
+        try:
+            return self._letterlist
+        except AttributeError:
+            numgens=len(self.gens)
+            self._letterlist=list(range(1,numgens+1))+list(range(-1,-(numgens+1),-1))
+            return self._letterlist
+
     def randomword(self,length):
         """
         Word that is the result of a random walk without backtracking of given length in the generators and inverses.
         """
-        numgens=len(self.gens)
-        letterlist = list(range(1,numgens+1))+list(range(-1,-(numgens+1),-1))
-        letters = []
-        for n in range(length):
-            nextletter=random.choice(letterlist)
-            if len(letters):
-                while nextletter==-letters[-1]:
-                    nextletter=random.choice(letterlist)
-            letters.append(nextletter)
-        return self.word(letters)
+        letterlist = self.letterlist()
+        return self.word(_nonbacktrackingwalk(letterlist,length))
 
     def random_word(self,length):
         """
@@ -210,21 +233,11 @@ class FGGroup(object):
         """
         Word that is the result of a random walk without backtracking of given length in the generators and inverses, and such that last letter is not inverse of first letter.
         """
-        numgens=len(self.gens)
-        letterlist = range(1,numgens+1)+range(-1,-(numgens+1),-1)
-        letters = []
-        if length==0:
-            pass
-        elif length==1:
-            nextletter=random.choice(letterlist)
-            letters.append(nextletter)
-        else:
-            for n in range(length-1):
-                nextletter=random.choice(letterlist)
-                if len(letters):
-                    while nextletter==-letters[-1]:
-                        nextletter=random.choice(letterlist)
-                letters.append(nextletter)
+        letterlist = self.letterlist()
+        letters = _nonbacktrackingwalk(letterlist,max(length-1,0))
+        if length==1:
+            letters.append(random.choice(letterlist))
+        elif length>1:
             nextletter=random.choice(letterlist)
             while nextletter==-letters[-1] or nextletter==-letters[0]:
                 nextletter=random.choice(letterlist)
@@ -235,12 +248,8 @@ class FGGroup(object):
         """
         Word that is the free reduction of a random walk of length n in the generators and inverses.
         """
-        numgens=len(self.gens)
-        letterlist = range(1,numgens+1)+range(-1,-(numgens+1),-1)
-        letters = []
-        for n in range(length):
-            letters.append(random.choice(letterlist))
-        return self.word(letters)
+        letterlist = self.letterlist()
+        return self.word(random.choices(letterlist,k=length))
         
 
     def random_multiword(self,numberofwords,length):
@@ -378,6 +387,8 @@ def common_ancestor(G,H):
         """
         Return a (smallish) group containing both G and H.
         """
+        if G is H:
+            return G
         Gancestors=[G]
         Hancestors=[H]
         while all([Gancestors[-1] is not y for y in Hancestors]) and all([Gancestors[-1] is not y for y in Hancestors]):
@@ -403,39 +414,104 @@ def common_ancestor(G,H):
 
 #----------  words
     
+def _nonbacktrackingwalk(letterlist,length):
+    """
+    List of letters of a uniformly random walk without backtracking of given length in letterlist, which should be closed under inverses.
+    """
+    if length<=0:
+        return []
+    # Instead of rejecting the inverse of the previous letter, draw from all but the last letter of letterlist and replace a drawn inverse by the last letter.
+    lastletter=letterlist[-1]
+    letters=[random.choice(letterlist)]
+    previousletter=letters[0]
+    for nextletter in random.choices(letterlist[:-1],k=length-1):
+        if nextletter==-previousletter:
+            nextletter=lastletter
+        letters.append(nextletter)
+        previousletter=nextletter
+    return letters
+
 def freereduce(l):
     """
     Free reduces a list of integers.
     """
     if len(l)<2:
-        return l
-    else:
-        reduction=[l[0]]
-        for i in range(len(l)-1):
-            if reduction==[]:
-                reduction=[l[i+1]]
-            else:
-                if reduction[-1]==-l[i+1]:
-                    reduction.pop()
-                else:
-                    reduction.append(l[i+1])
+        return list(l)
+    if len(l)>=_longword:
+        kernel=_compiledfreereduce()
+        if kernel is not None:
+            a=np.fromiter(l,dtype=np.int64,count=len(l))
+            out=np.empty_like(a)
+            return out[:kernel(a,out)].tolist()
+    reduction=[]
+    for x in l:
+        if reduction and reduction[-1]==-x:
+            reduction.pop()
+        else:
+            reduction.append(x)
     return reduction
 
+_longword=128 # below this length converting to and from arrays costs more than the compiled loop saves
+
+def _freereducearray(a,out):
+    """
+    Write the free reduction of the array a to the start of out, and return its length.
+    """
+    top=0
+    for x in a:
+        if top>0 and out[top-1]==-x:
+            top-=1
+        else:
+            out[top]=x
+            top+=1
+    return top
+
+@functools.lru_cache(maxsize=None)
+def _compiledfreereduce():
+    """
+    _freereducearray compiled by numba, or None if numba is not available.
+    numba is only imported the first time a long word is reduced, so importing this module stays cheap.
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    return numba.njit(_freereducearray)
+
+def _cyclicreductionbounds(letters):
+    """
+    Return start,end such that letters[start:end] is what remains after cancelling inverse pairs of first and last letters while more than two letters remain.
+    """
+    start=0
+    end=len(letters)
+    while end-start > 2 and letters[start]+letters[end-1]==0:
+        start+=1
+        end-=1
+    return start,end
+
 def stringtolist(letters, lettering):
     """
     Convert some alphabetic word to a list of numbers.
     """
+    offset=len(lettering)//2
+    positions={}
+    for position, letter in enumerate(lettering):
+        positions.setdefault(letter,position-offset)
+    longest=max(len(letter) for letter in lettering)
+    if longest==1 and all(character in positions for character in letters): # every letter is a single character
+        return [positions[character] for character in letters]
     numbers=[]
-    prefix=''
-    suffix=copy.copy(letters)
-    while suffix:
-        prefix+=suffix[0]
-        suffix=suffix[1:]
-        if prefix in lettering:
-             numbers.append(lettering.index(prefix)-len(lettering)//2)
-             prefix=''
-    if prefix!='':
-         raise ValueError(prefix+" was not found in "+str(lettering))
+    start=0
+    end=1
+    while start<len(letters):
+        # take the shortest prefix of what is left that is a letter
+        number=positions.get(letters[start:end])
+        if number is not None:
+            numbers.append(number)
+            start=end
+        elif end-start==longest or end==len(letters):
+            raise ValueError(letters[start:]+" was not found in "+str(lettering))
+        end+=1
     return numbers
          
 
@@ -476,7 +552,9 @@ class Word(object):
     """   
     def __init__(self,letters, group):
         self.group=group
-        if hasattr(letters,'group'):# letters is already a word in some group
+        if type(letters) is list and letters and type(letters[0]) is int: # the usual case, checked first to skip the tests below
+            self.letters=freereduce(list(letters))
+        elif hasattr(letters,'group'):# letters is already a word in some group
             self.letters=[x for x in letters.letters]
         elif hasattr(letters,'isalpha'): #letters is a string
             self.letters=freereduce(stringtolist(letters,self.group.lettering))
@@ -502,53 +580,61 @@ class Word(object):
         if G is None:
             raise TypeError("can not multiply words that are not in a common group")
         else:
-            selfinG=self.group.get_inclusion(G)(self)
-            otherinG=other.group.get_inclusion(G)(other)
-            return G.word(selfinG.letters+otherinG.letters)
+            return G.word(self._ingroup(G).letters+other._ingroup(G).letters)
     
     def __ne__(self, other):
         G=common_ancestor(self.group,other.group)
         if G is None:
             return True
         else:
-            return G.word__ne__(self.group.get_inclusion(G)(self),other.group.get_inclusion(G)(other))
+            return G.word__ne__(self._ingroup(G),other._ingroup(G))
 
     def __eq__(self, other):
         G=common_ancestor(self.group,other.group)
         if G is None:
             return False
         else:
-            return G.word__eq__(self.group.get_inclusion(G)(self),other.group.get_inclusion(G)(other))
+            return G.word__eq__(self._ingroup(G),other._ingroup(G))
 
     def __cmp__(self, other):
         G=common_ancestor(self.group,other.group)
         if G is None:
             return False
         else:
-            return G.word__cmp__(self.group.get_inclusion(G)(self),other.group.get_inclusion(G)(other))
+            return G.word__cmp__(self._ingroup(G),other._ingroup(G))
 
     def __hash__(self):
+        # The hash only depends on the letters, so keep it until self.letters is replaced (for instance by pop).
+        try:
+            if self._hashedletters is self.letters:
+                return self._hash
+        except AttributeError:
+            pass
         G=self.group
         while hasattr(G,'supergroup'):
             G=G.supergroup
-        return G.word__hash__(self.group.get_inclusion(G)(self))
+        self._hash=G.word__hash__(self._ingroup(G))
+        self._hashedletters=self.letters
+        return self._hash
+
+    def _ingroup(self,G):
+        """
+        This word as a word in the supergroup G, without evaluating the inclusion when G is the group of the word.
+        """
+        if G is self.group:
+            return self
+        return self.group.get_inclusion(G)(self)
         
 
 
     def __pow__(self,n):
-        # take n'th power
-        result = Word([], self.group)
+        # take n'th power, repeating the letters and reducing once
         if n == 0:
-            return result
+            return Word([], self.group)
         elif n>0:
-            for i in range(n):
-                result = result * self
-            return result
+            return self.group.word(self.letters*n)
         else:
-            inverse = Word([-i for i in reversed(self.letters)], self.group)
-            for i in range(-n):
-                result = result * inverse
-            return result
+            return self.group.word([-i for i in reversed(self.letters)]*(-n))
         
     def is_element(self,G):
         """
@@ -562,39 +648,25 @@ class Word(object):
         """
         if supergroup is None:
              supergroup=self.group
-        inclusionchain=Automorphism(self.group) # start with the identity automorphism
-        currentgroup=self.group
-        while currentgroup!=supergroup:
-            try:
-                inclusionchain=compose(currentgroup.inclusion,inclusionchain)
-                currentgroup=currentgroup.supergroup
-            except AttributeError:
-                print(str(self)+ " is not a recognized word in " +supergroup)
+        imageword=self._ingroup(supergroup) # the inclusion chain is composed once per pair of groups by get_inclusion
         if len(self.letters)==0:
             return supergroup.identity
         else:
-            imageword=inclusionchain(self)
+            offset=len(supergroup.lettering)//2
+            answer=[supergroup.lettering[letter+offset] for letter in imageword.letters]
             if supergroup.displaystyle==str:
-                answer = ''
-                for letter in imageword.letters:
-                    answer+=supergroup.lettering[letter+len(supergroup.lettering)//2]
+                return ''.join(answer)
             else:
-                answer=[]
-                for letter in imageword.letters:
-                    answer.append(supergroup.lettering[letter+len(supergroup.lettering)//2])
-            return str(answer)
+                return str(answer) # callers concatenate and hash the result, so list style is returned as a string too
 
     def cycle(self,steps=1):
         """
         Return cyclic permutation by some number of steps. abc -> bca
         """
-        cycledletters=copy.copy(self.letters)
-        if len(self)>0:
-            remainingsteps=steps%len(self)
-            while remainingsteps:
-                cycledletters=cycledletters[1:]+cycledletters[:1]
-                remainingsteps-=1
-        return self.group.word(cycledletters)
+        if len(self)==0:
+            return self.group.word([])
+        steps=steps%len(self)
+        return self.group.word(self.letters[steps:]+self.letters[:steps])
                 
     
                   
@@ -604,8 +676,12 @@ class Word(object):
     def pop(self):
         """
         Return first letter (as a number!), and shorten word.
+        Each call copies the rest of the word, so to read through a word iterate over its letters instead.
         """
         # for backwards compatibility
+        # self.letters is replaced rather than modified in place, because other code may hold on to the old list and the cached hash is tied to it.
+        if getattr(self,'_shared',False):
+            raise ValueError("can not pop from the shared word "+str(self)+" returned by gen, use a copy")
         first = self.letters[0]
         self.letters = self.letters[1:]
         return first
@@ -617,10 +693,7 @@ class Word(object):
         # for backwards compatibility
         key = 'ZYXWVUTSRQPONMLKJIHGFEDCBA abcdefghijklmnopqrstuvwxyz'
         key_offset = 26
-        strout = ''
-        for letter in self.letters:
-            strout = strout+key[letter+key_offset]
-        return strout
+        return ''.join([key[letter+key_offset] for letter in self.letters])
 
 
 
@@ -638,6 +711,15 @@ def guess_rank(*wordlist):
 
 #---------- homomorphisms
 
+def _undefinedimage(letter):
+    raise KeyError('The map is not defined on generator '+str(letter)+' of the domain.')
+
+def _trivialimage(letter):
+    return []
+
+def _fixedimage(letter):
+    return [letter]
+
 class PDHomo(object):
     """
     Partially defined group homomorphism. May only be defined on some of the generators of the domain.
@@ -668,19 +750,28 @@ class PDHomo(object):
         return str(self.domain)+" -> "+str(self.codomain)+":\n"+"\n".join(imagelist)
 
     def __call__(self,w): #evaluate the homomorphism on the word w and return a word in codomain
-        theletters=copy.copy(w.letters)
+        return self.codomain.word(self._imageletters(w,_undefinedimage))
+
+    def _imageletters(self,w,missingimage):
+        """
+        Concatenation of the letters of the images of the letters of w.
+        missingimage(letter) gives the letters to use when neither the generator nor its inverse is in self.images.
+        The image of an inverse generator is computed once per call, the first time it is needed.
+        """
+        images=self.images
+        inverseimages=dict()
         imagewordletters=[]
-        while theletters:
-            nextletter=theletters.pop(0)
-            try:
-                nextwordletters=self.images[nextletter].letters
-            except KeyError:
-                try:
-                    nextwordletters=[-i for i in reversed(self.images[-nextletter])]
-                except KeyError:
-                    raise KeyError('The map is not defined on generator '+str(nextletter)+' of the domain.')
-            imagewordletters+=nextwordletters
-        return self.codomain.word(imagewordletters)
+        for nextletter in w.letters:
+            if nextletter in images:
+                imagewordletters+=images[nextletter].letters
+            elif nextletter in inverseimages:
+                imagewordletters+=inverseimages[nextletter]
+            elif -nextletter in images:
+                inverseimages[nextletter]=[-i for i in reversed(images[-nextletter].letters)]
+                imagewordletters+=inverseimages[nextletter]
+            else:
+                imagewordletters+=missingimage(nextletter)
+        return imagewordletters
 
     def alpha(self):
         print(str(domain)+" -> "+str(codomain)+":\n"+"\n".join([domain.word([i]).alpha()+" -> "+self(self.domain.word([i])).alpha() for i in self.variant_generators()]))
@@ -693,19 +784,7 @@ class Homomorphism(PDHomo):
         PDHomo.__init__(self,domain,codomain,generatorimagedict)
         
     def __call__(self,w): #evaluate the homomorphism on the word w and return a word in codomain
-        theletters=copy.copy(w.letters)
-        imagewordletters=[]
-        while theletters:
-            nextletter=theletters.pop(0)
-            try:
-                nextwordletters=self.images[nextletter].letters
-            except KeyError:
-                try:
-                    nextwordletters=[-i for i in reversed(self.images[-nextletter].letters)]
-                except KeyError:
-                    nextwordletters=[] # generators not in generatorimagedict are sent to trivial word
-            imagewordletters+=nextwordletters
-        return self.codomain.word(imagewordletters)
+        return self.codomain.word(self._imageletters(w,_trivialimage)) # generators not in generatorimagedict are sent to trivial word
 
     def __str__(self):
         imagelist=[]
@@ -780,31 +859,14 @@ class Automorphism(Endomorphism):
          raise RuntimeError("inverse not implemented for arbitrary automorphisms")
 
     def __pow__(self,n):
-        # for large n would recursive definition be faster or slower?
         result=Automorphism(self.domain) # the identity automorphism
         if(n)>=0:
-            for i in range(n):
-                result=result * self
+            return _squareandmultiply(result,self,n)
         else:
-            inverse=self.inverse()
-            for i in range(-n):
-                result=result * inverse
-        return result
+            return _squareandmultiply(result,self.inverse(),-n)
         
     def __call__(self,w): #evaluate the automorphism on the word w and return a word in codomain
-        theletters=copy.copy(w.letters)
-        imagewordletters=[]
-        while theletters:
-            nextletter=theletters.pop(0)
-            try:
-                nextwordletters=self.images[nextletter].letters
-            except KeyError:
-                try:
-                    nextwordletters=[-i for i in reversed(self.images[-nextletter].letters)]
-                except KeyError:
-                    nextwordletters=[nextletter] # if neither the generator nor its inverse are in the dict then it is fixed by the automorphism
-            imagewordletters+=nextwordletters
-        return self.codomain.word(imagewordletters)
+        return self.codomain.word(self._imageletters(w,_fixedimage)) # if neither the generator nor its inverse are in the dict then it is fixed by the automorphism
 
 class InnerAutomorphism(Automorphism):
     """
@@ -838,6 +900,64 @@ class InnerAutomorphism(Automorphism):
     def inverse(self):
         return self**(-1)
 
+class LazyAutomorphism(Automorphism):
+    """
+    Product of a list of automorphisms, evaluated by applying the factors in turn instead of composing them.
+    The first factor is applied last, so LazyAutomorphism(G,[alpha,beta])(w)==alpha(beta(w)).
+
+    >>> G=FGGroup(numgens=2)
+    >>> a=G.word([1]); b=G.word([2])
+    >>> alpha=Automorphism(G,{1:a*b}); beta=Automorphism(G,{2:b*a})
+    >>> gamma=LazyAutomorphism(G,[alpha,beta])
+    >>> gamma(b)
+    [2, 1, 2]
+    >>> alpha(beta(b))
+    [2, 1, 2]
+    >>> (gamma*gamma)(a)
+    [1, 2, 2, 1, 2]
+    >>> (alpha*beta*alpha*beta)(a)
+    [1, 2, 2, 1, 2]
+    """
+    def __init__(self, domain, factors=None):
+        self.domain=domain
+        self.codomain=domain
+        self.factors=list(factors) if factors else []
+
+    def __repr__(self):
+        return str(self.domain)+' -> '+str(self.codomain)+': '+' * '.join('('+repr(alpha)+')' for alpha in self.factors)
+
+    def variant_generators(self):
+        return range(1,1+len(self.domain.gens))
+
+    def __call__(self,w):
+        w=self.codomain.word(w)
+        for alpha in reversed(self.factors):
+            w=alpha(w)
+        return w
+
+    def __mul__(self,other):
+        if type(self)==type(other) and self.domain is other.domain:
+            return LazyAutomorphism(self.domain,self.factors+other.factors)
+        else:
+            return LazyAutomorphism(self.domain,self.factors+[other])
+
+    def inverse(self):
+        return LazyAutomorphism(self.domain,[alpha.inverse() for alpha in reversed(self.factors)])
+
+
+def _squareandmultiply(identity,base,n):
+    """
+    Return base**n for n>=0 using O(log n) multiplications, starting from the given identity automorphism.
+    """
+    result=identity
+    while n:
+        if n&1:
+            result=result*base
+        n>>=1
+        if n:
+            base=base*base
+    return result
+
 
 def PDcompose(alpha,beta):
     return PDHomo(beta.domain,alpha.codomain,dict([(i,alpha(beta(beta.domain.word([i])))) for i in beta.variant_generators()]))
@@ -55,7 +55,7 @@ def simple_edges(vertexlist):
     """
     Take an i-trace and return list of simple edges.
     """
-    remaining=[(vertexlist[2*i],vertexlist[2*i+1]) for i in range(len(vertexlist)/2)]
+    remaining=[(vertexlist[2*i],vertexlist[2*i+1]) for i in range(len(vertexlist)//2)]
     simple=[]
     while remaining:
         thisedge=remaining.pop()
@@ -12,7 +12,6 @@ import os
 from collections import deque
 import grouptheory.freegroups.enumeratefreegroupwords as enum
 import glob
-#import subprocess32
 import subprocess
 
 # One of the checks that certify_hyperbolicity does is to use the walrus package in GAP. The GAP startup takes a while. If multiple checks are to be run it is faster to spawn GAP only once and reuse it as follows:
@@ -256,10 +255,8 @@ def girth(relator,verbose=False,**kwargs):
         timeout=10 # default timeout 10s       
     if not os.path.isfile(thefilename+'.diff1'):
         try:
-            #subprocess32.run(['autgroup','-silent',thefilename],check=True,timeout=timeout)
             subprocess.run(['autgroup','-silent',thefilename],check=True,timeout=timeout)
         except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
-            #except (subprocess32.TimeoutExpired, subprocess32.CalledProcessError) as e:
             if cleanup:
                 files = glob.glob('./'+thefilename+"*")
                 for file in files:
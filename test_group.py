@@ -38,6 +38,14 @@ class WordTest(unittest.TestCase):
         w0,w1 = self.F.cyclic_reducer(self.w5)
         self.assertEqual([w0.letters,w1.letters],[[-2,-1],[2,1]])
 
+    def test_gen_words_are_shared_and_can_not_be_popped(self):
+        x=self.F.gen(1)
+        self.assertIs(self.F.gen(1),x)
+        with self.assertRaises(ValueError):
+            x.pop()
+        self.assertEqual(self.F.gen(1).letters,[1])
+        self.assertEqual(self.F.word(x).pop(),1) # copies can be modified
+
     # TODO test random_methods
 
 #class SubgroupTest(unittest.TestCase):
@@ -56,5 +64,24 @@ class FreeReduceTest(unittest.TestCase):
         for unreduced,reduced in self.examples:
             self.assertEqual(group.freereduce(unreduced),reduced)
 
+    def test_freereduce_long(self):
+        # long enough to take the compiled path when numba is available
+        n=group._longword
+        self.assertEqual(group.freereduce([1,2]*n+[-2,-1]*n+[3]),[3])
+        self.assertEqual(group.freereduce([1]*n+[2,-2]+[-1]*(n-1)),[1])
+
+    def test_freereduce_returns_new_list(self):
+        l=[1]
+        self.assertIsNot(group.freereduce(l),l)
+
 
     
+
+class StringToListTest(unittest.TestCase):
+    def test_stringtolist(self):
+        self.assertEqual(group.stringtolist('xyXY',['Y','X','','x','y']),[1,2,-1,-2])
+        self.assertEqual(group.stringtolist('a1b2B2',['b2','a1','','A1','B2']),[-1,-2,2])
+
+    def test_stringtolist_unknown_letter(self):
+        with self.assertRaises(ValueError):
+            group.stringtolist('xz',['X','','x'])